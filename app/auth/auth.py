@@ -3,14 +3,20 @@ This module contains functions related to authentication, such as creating and v
 creating access and refresh tokens, and checking if a token is valid.
 """
 
+import asyncio
+import inspect
+import time
+import weakref
 from datetime import datetime, timedelta
 from typing import Union, Any
-from functools import wraps
+from functools import partial, wraps
+
+import anyio
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from jwt.exceptions import InvalidTokenError
 from fastapi import HTTPException
-from app.models.token_table import TokenTable
+from app.models.token_table import TokenTable, token_digest
 from app.models.user_types import UserType
 from app.models.user import User
 from app.config.settings import (
@@ -19,10 +25,36 @@ from app.config.settings import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     REFRESH_TOKEN_EXPIRE_MINUTES,
     ALGORITHM,
+    ROUTE_THREADPOOL_SIZE,
+    AUTH_CACHE_TTL,
+    AUTH_CACHE_SIZE,
 )
+from app.utils.cache import TTLCache
 
 password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_route_limiters = weakref.WeakKeyDictionary()
+
+# access token -> CurrentUser, only holds tokens that were valid when checked
+_auth_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+
+class CurrentUser:
+    """
+    A snapshot of the authenticated user, safe to share between requests and sessions.
+    """
+
+    __slots__ = ("id", "username", "email", "user_type")
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.user_type = user.user_type
+
+    def __repr__(self):
+        return f"<CurrentUser {self.username}>"
+
 
 def get_hashed_password(password: str) -> str:
     """Return the hashed password"""
@@ -99,76 +131,126 @@ def decode_refresh_jwt(jwtoken: str) -> dict:
         return None
 
 
-def get_user(jwtoken: str, db: Any) -> Any:
+def get_route_limiter() -> anyio.CapacityLimiter:
+    """
+    Returns the limiter bounding how many sync route bodies run at once in the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    limiter = _route_limiters.get(loop)
+    if limiter is None:
+        limiter = anyio.CapacityLimiter(ROUTE_THREADPOOL_SIZE)
+        _route_limiters[loop] = limiter
+    return limiter
+
+
+async def run_route(func, *args, **kwargs):
     """
-    Get the user from the database.
+    Runs a route body without blocking the event loop.
+
+    Coroutine functions are awaited directly, sync functions run in the route thread pool.
+    """
+    if inspect.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await anyio.to_thread.run_sync(
+        partial(func, *args, **kwargs), limiter=get_route_limiter()
+    )
+
+
+def authenticate(request: Any, session: Any) -> Any:
+    """
+    Checks the bearer token of a request and returns the user it belongs to.
 
     Args:
-    - jwtoken (str): JWT token to decode.
-    - db (Any): Database session.
+    - request (Request): The HTTP request object.
+    - session (Session): Database session.
 
     Returns:
-    - Any: User if the token is valid, None otherwise.
+    - User: The user the token was issued to.
+
+    Raises:
+    - HTTPException: If the token is missing, invalid, expired or blocked.
     """
-    payload = decode_jwt(jwtoken)
-    print(payload)
-    if payload is not None:
-        user_id = payload.get("sub")
-        print(user_id)
-        if user_id is not None:
-            user = db.query(User).filter(User.id == user_id).first()
-            return user
-    return None
+    if not request:
+        raise HTTPException(status_code=403, detail="Invalid request")
 
+    authorization: str = request.headers.get("Authorization")
+    if not authorization:
+        raise HTTPException(
+            status_code=403, detail="You are not authorized to access this resource"
+        )
 
-def token_required(func):
-    """Decorator to check if token is valid"""
+    scheme, _, token = authorization.partition(" ")
 
-    @wraps(func)
-    async def wrapper(*args, **kwargs):
-        request = kwargs.get("request")
-        if not request:
-            raise HTTPException(status_code=403, detail="Invalid request")
+    if scheme.lower() != "bearer":
+        raise HTTPException(status_code=403, detail="Invalid authorization scheme")
 
-        authorization: str = request.headers.get("Authorization")
-        if not authorization:
-            raise HTTPException(
-                status_code=403, detail="You are not authorized to access this resource"
-            )
+    user = _auth_cache.get(token)
+    if user is not None:
+        return user
 
-        scheme, _, token = authorization.partition(" ")
+    try:
+        payload = jwt.decode(token, JWT_SECRET_KEY, ALGORITHM)
+    except JWTError as exc:
+        raise HTTPException(
+            status_code=403, detail="Invalid token or expired token"
+        ) from exc
+
+    user_id = payload.get("sub")
+    if not user_id:
+        raise HTTPException(
+            status_code=403, detail="Invalid token or expired token"
+        )
 
-        if scheme.lower() != "bearer":
-            raise HTTPException(status_code=403, detail="Invalid authorization scheme")
+    user = (
+        session.query(User)
+        .join(TokenTable, TokenTable.user_id == User.id)
+        .filter(
+            TokenTable.user_id == user_id,
+            TokenTable.access_token_hash == token_digest(token),
+            TokenTable.status == True,
+        )
+        .first()
+    )
 
-        try:
-            payload = jwt.decode(token, JWT_SECRET_KEY, ALGORITHM)
-        except JWTError as exc:
-            raise HTTPException(
-                status_code=403, detail="Invalid token or expired token"
-            ) from exc
+    if not user:
+        raise HTTPException(status_code=403, detail="Token blocked")
 
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(
-                status_code=403, detail="Invalid token or expired token"
-            )
+    user = CurrentUser(user)
+    # Never serve a token from the cache after it has expired
+    ttl = min(AUTH_CACHE_TTL, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        _auth_cache.set(token, user, ttl=ttl)
+    return user
 
-        data = (
-            kwargs["session"]
-            .query(TokenTable)
-            .filter_by(user_id=user_id, access_token=token, status=True)
-            .first()
-        )
 
-        if not data:
-            raise HTTPException(status_code=403, detail="Token blocked")
+def revoke_cached_token(access_token: str):
+    """
+    Drops an access token from the authentication cache of this worker.
+
+    Call it whenever the token row is revoked or replaced. Other workers stop
+    accepting the token once their cache entry expires, after at most AUTH_CACHE_TTL seconds.
+    """
+    _auth_cache.pop(access_token)
 
-        print("Reached end")
 
-        user = get_user(token, kwargs["session"])
+def token_required(func):
+    """
+    Decorator to check if token is valid.
+
+    The token check and sync route bodies run in a bounded thread pool, so blocking
+    database and Mobius calls do not stall the event loop. Async route bodies are awaited.
+    """
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        user = await anyio.to_thread.run_sync(
+            authenticate,
+            kwargs.get("request"),
+            kwargs.get("session"),
+            limiter=get_route_limiter(),
+        )
         kwargs["current_user"] = user
-        return func(*args, **kwargs)
+        return await run_route(func, *args, **kwargs)
 
     return wrapper
 
@@ -176,15 +258,25 @@ def token_required(func):
 def admin_required(func):
     """Decorator to check if user is admin"""
 
-    @wraps(func)
-    def wrapper(*args, **kwargs):
+    def check_admin(kwargs):
         user = kwargs.get("current_user")
-        print(user)
         if user.user_type != UserType.ADMIN.value:
             raise HTTPException(
                 status_code=403, detail="You are not authorized to access this resource"
             )
 
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            check_admin(kwargs)
+            return await func(*args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        check_admin(kwargs)
         return func(*args, **kwargs)
 
     return wrapper
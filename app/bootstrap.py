@@ -0,0 +1,90 @@
+"""
+This module prepares the database and Mobius before the application is started.
+
+Run it once per deployment, before the workers start:
+    python -m app.bootstrap
+"""
+
+import sys
+import time
+
+import requests
+from sqlalchemy import text
+
+from app.database import engine, SessionLocal
+from app.migrations import upgrade
+from app.utils.initial_setup import initial_setup
+from app.config.settings import (
+    OM2M_URL,
+    STARTUP_RETRIES,
+    STARTUP_BACKOFF,
+    STARTUP_BACKOFF_MAX,
+)
+
+
+def check_database():
+    """Raises if the database cannot answer a trivial query"""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+def check_mobius(timeout=5):
+    """Raises if Mobius is not reachable or not ready"""
+    res = requests.get(OM2M_URL, timeout=timeout)
+    if res.status_code == 404:
+        raise requests.exceptions.RequestException("Mobius not found")
+    elif res.status_code == 503:
+        raise requests.exceptions.RequestException("Mobius not ready")
+
+
+def wait_for(name, check):
+    """
+    Calls check until it succeeds, sleeping with exponential backoff between attempts.
+
+    Returns:
+        bool: True once check succeeded, False if every attempt failed.
+    """
+    delay = STARTUP_BACKOFF
+    for i in range(STARTUP_RETRIES):
+        try:
+            check()
+            print(f"Connection to {name} successful.")
+            return True
+        except Exception as e:
+            print(f"Error connecting to {name}: {e}")
+            if i + 1 < STARTUP_RETRIES:
+                print(f"Attempt {i+1} failed. Retrying in {delay:g} seconds...")
+                time.sleep(delay)
+                delay = min(delay * 2, STARTUP_BACKOFF_MAX)
+    print(f"All attempts to connect to {name} failed.")
+    return False
+
+
+def bootstrap():
+    """
+    Waits for Postgres, applies the migrations, waits for Mobius and runs the initial setup.
+    """
+    if not wait_for("database", check_database):
+        sys.exit(1)
+
+    upgrade(engine)
+
+    # ########################################################
+    # ## WARNING: DO NOT CALL reset_database() HERE        ##
+    # ## UNLESS YOU KNOW EXACTLY WHAT YOU ARE DOING!       ##
+    # ## THIS COULD POTENTIALLY CAUSE SERIOUS ISSUES.      ##
+    # ## ENSURE YOU MANUALLY CLEAR ONEM2M DB AFTER THIS.   ##
+    # ########################################################
+
+    if not wait_for("Mobius", check_mobius):
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        initial_setup(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    bootstrap()
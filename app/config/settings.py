@@ -16,3 +16,44 @@ OM2M_USERNAME = os.getenv("OM2M_USERNAME")
 OM2M_PASSWORD = os.getenv("OM2M_PASSWORD")
 ROOT_PATH = os.getenv("ROOT_PATH") or '/'
 MOBIUS_XM2MRI = os.getenv("MOBIUS_XM2MRI")
+CIN_BATCH_MAX_SIZE = int(os.getenv("CIN_BATCH_MAX_SIZE") or 500)
+NODE_CACHE_TTL = float(os.getenv("NODE_CACHE_TTL") or 10)
+NODE_CACHE_SIZE = int(os.getenv("NODE_CACHE_SIZE") or 10000)
+OM2M_POOL_SIZE = int(os.getenv("OM2M_POOL_SIZE") or 20)
+OM2M_KEEPALIVE = int(os.getenv("OM2M_KEEPALIVE") or 10)
+OM2M_TIMEOUT = float(os.getenv("OM2M_TIMEOUT") or 10)
+OM2M_RETRIES = int(os.getenv("OM2M_RETRIES") or 2)
+OM2M_RETRY_BACKOFF = float(os.getenv("OM2M_RETRY_BACKOFF") or 0.2)
+ROUTE_THREADPOOL_SIZE = int(os.getenv("ROUTE_THREADPOOL_SIZE") or 40)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or 10)
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW") or 10)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT") or 30)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE") or 1800)
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL") or 30)
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE") or 10000)
+TOKEN_PURGE_INTERVAL = float(os.getenv("TOKEN_PURGE_INTERVAL") or 3600)
+STARTUP_RETRIES = int(os.getenv("STARTUP_RETRIES") or 8)
+STARTUP_BACKOFF = float(os.getenv("STARTUP_BACKOFF") or 1)
+STARTUP_BACKOFF_MAX = float(os.getenv("STARTUP_BACKOFF_MAX") or 30)
+GEOCODER = (os.getenv("GEOCODER") or "auto").lower()
+PINCODE_DATASET = os.getenv("PINCODE_DATASET")
+PINCODE_MAX_DISTANCE_KM = float(os.getenv("PINCODE_MAX_DISTANCE_KM") or 25)
+GEOCODE_CACHE = (os.getenv("GEOCODE_CACHE") or "true").lower() in ("1", "true", "yes")
+GEOCODE_CACHE_PRECISION = int(os.getenv("GEOCODE_CACHE_PRECISION") or 4)
+GEOCODE_NEGATIVE_TTL = int(os.getenv("GEOCODE_NEGATIVE_TTL") or 86400)
+IMPORT_CONCURRENCY = int(os.getenv("IMPORT_CONCURRENCY") or 16)
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS") or 2)
+IMPORT_JOB_CHUNK = int(os.getenv("IMPORT_JOB_CHUNK") or 500)
+IMPORT_JOB_STALE = int(os.getenv("IMPORT_JOB_STALE") or 900)
+TOKEN_BATCH_MAX_SIZE = int(os.getenv("TOKEN_BATCH_MAX_SIZE") or 1000)
+DEPLOY_TOKEN_TOLERANCE_M = float(os.getenv("DEPLOY_TOKEN_TOLERANCE_M") or 25)
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT") or 1000)
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX") or 5000)
+LATEST_CACHE_TTL = int(os.getenv("LATEST_CACHE_TTL") or 10)
+LATEST_CACHE_SIZE = int(os.getenv("LATEST_CACHE_SIZE") or 50000)
+LATEST_NOTIFY_SECRET = os.getenv("LATEST_NOTIFY_SECRET")
+LATEST_BATCH_MAX_SIZE = int(os.getenv("LATEST_BATCH_MAX_SIZE") or 5000)
+LATEST_FETCH_CONCURRENCY = int(os.getenv("LATEST_FETCH_CONCURRENCY") or 16)
+TIMESERIES_ENABLED = (os.getenv("TIMESERIES_ENABLED") or "true").lower() in ("1", "true", "yes")
+TIMESERIES_PARTITIONS_AHEAD = int(os.getenv("TIMESERIES_PARTITIONS_AHEAD") or 2)
+READINGS_PAGE_MAX = int(os.getenv("READINGS_PAGE_MAX") or 10000)
@@ -4,28 +4,59 @@ This module provides functionality for connecting to the database and creating a
 
 from sqlalchemy import create_engine, MetaData
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.orm import sessionmaker
 
-from app.config.settings import DATABASE_URL
+from app.config.settings import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+)
 
 Base = declarative_base()
 
+# The engine and its connection pool live for the whole process, sessions only borrow connections
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
 
 def get_session():
     """
     Returns a new session from the session factory.
+
+    Closing the session returns its connection to the pool.
     """
-    SessionLocal = scoped_session(
-        sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    )
     db = SessionLocal()
-    engine.dispose()
     try:
         yield db
     finally:
         db.close()
 
 
+def get_pool_status() -> dict:
+    """
+    Returns the usage of the connection pool.
+    """
+    pool = engine.pool
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # QueuePool counts overflow from -pool_size until the pool is full
+        "overflow": max(pool.overflow(), 0),
+    }
+
+
 def reset_database():
     """
     Drops all tables and recreates them.
@@ -39,6 +70,3 @@ def reset_database():
         # Recreate all tables
         Base.metadata.create_all(bind=engine)
     print("Database has been reset")
-
-
-engine = create_engine(DATABASE_URL, pool_size=3, max_overflow=0)
@@ -0,0 +1,247 @@
+"""
+This module holds the versioned schema migrations of the database.
+
+Migrations run once, from `python -m app.migrations upgrade`, before the workers start.
+The versions already applied are recorded in the schema_migrations table.
+"""
+
+from sqlalchemy import text
+
+from app.database import Base
+
+# Arbitrary key of the Postgres advisory lock held while migrating
+MIGRATION_LOCK_ID = 7_294_311
+
+
+class Migration:
+    """
+    A numbered schema change.
+
+    A migration either lists SQL statements or provides an upgrade(connection) function.
+    Transactional migrations are applied together with their schema_migrations row, so a
+    failure leaves nothing behind. Non-transactional ones run in autocommit mode, which
+    statements like CREATE INDEX CONCURRENTLY need; keep them idempotent.
+    """
+
+    def __init__(self, version, name, statements=(), upgrade=None, transactional=True):
+        self.version = version
+        self.name = name
+        self.statements = statements
+        self.upgrade = upgrade
+        self.transactional = transactional
+
+    def apply(self, connection):
+        """Runs the migration on the given connection"""
+        if self.upgrade is not None:
+            self.upgrade(connection)
+        for statement in self.statements:
+            connection.execute(text(statement))
+
+    def __repr__(self):
+        return f"<Migration {self.version:04d} {self.name}>"
+
+
+def create_baseline(connection):
+    """Creates every table of the models that does not exist yet"""
+    # pylint: disable=import-outside-toplevel,unused-import
+    from app.models import (
+        node,
+        node_owners,
+        sensor_types,
+        subscription,
+        token,
+        token_table,
+        user,
+        vertical,
+    )
+
+    Base.metadata.create_all(bind=connection)
+
+
+NODE_INDEXES = [
+    ("ix_nodes_token_num", "nodes (token_num)"),
+    ("ix_nodes_node_name", "nodes (node_name)"),
+    ("ix_nodes_name", "nodes (name)"),
+    ("ix_nodes_sensor_type_id_lat_long", "nodes (sensor_type_id, lat, long)"),
+    (
+        "ix_nodes_sensor_type_id_sensor_node_number",
+        "nodes (sensor_type_id, sensor_node_number)",
+    ),
+    ("ix_node_owners_node_id", "node_owners (node_id)"),
+    ("ix_node_owners_vendor_id", "node_owners (vendor_id)"),
+]
+"""Indexes of the node_indexes migration, by name"""
+
+
+def drop_invalid_index(connection, name: str):
+    """
+    Drops the index with the given name if it is INVALID.
+
+    A failed CREATE INDEX CONCURRENTLY leaves such an index behind, and IF NOT EXISTS
+    would then skip building it again.
+    """
+    invalid = connection.execute(
+        text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        print(f"Dropping invalid index {name}")
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def create_node_indexes(connection):
+    """Builds the node lookup indexes without locking the tables against writes"""
+    for name, target in NODE_INDEXES:
+        drop_invalid_index(connection, name)
+        connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target}"))
+
+
+def create_geocode_cache(connection):
+    """Creates the geocode_cache table"""
+    # pylint: disable=import-outside-toplevel
+    from app.models.geocode_cache import GeocodeCache
+
+    GeocodeCache.__table__.create(bind=connection, checkfirst=True)
+
+
+def create_import_jobs(connection):
+    """Creates the import_jobs and import_job_items tables"""
+    # pylint: disable=import-outside-toplevel
+    from app.models.import_job import ImportJob, ImportJobItem
+
+    ImportJob.__table__.create(bind=connection, checkfirst=True)
+    ImportJobItem.__table__.create(bind=connection, checkfirst=True)
+
+
+def create_sequence_counters(connection):
+    """Creates the sequence_counters table"""
+    # pylint: disable=import-outside-toplevel
+    from app.models.sequence_counter import SequenceCounter
+
+    SequenceCounter.__table__.create(bind=connection, checkfirst=True)
+
+
+def create_readings(connection):
+    """Creates the partitioned readings table and its first monthly partitions"""
+    # pylint: disable=import-outside-toplevel
+    from app.models.reading import Reading
+    from app.utils.timeseries import create_partition, upcoming_months
+
+    Reading.__table__.create(bind=connection, checkfirst=True)
+    connection.execute(
+        text("CREATE TABLE IF NOT EXISTS readings_default PARTITION OF readings DEFAULT")
+    )
+    for start in upcoming_months():
+        create_partition(connection, start)
+
+
+MIGRATIONS = [
+    Migration(1, "baseline", upgrade=create_baseline),
+    Migration(
+        2,
+        "token_digests",
+        [
+            "ALTER TABLE token ADD COLUMN IF NOT EXISTS access_token_hash VARCHAR(64)",
+            "ALTER TABLE token ADD COLUMN IF NOT EXISTS refresh_token_hash VARCHAR(64)",
+            "UPDATE token SET access_token_hash = encode(sha256(access_token::bytea), 'hex') "
+            "WHERE access_token_hash IS NULL",
+            "UPDATE token SET refresh_token_hash = encode(sha256(refresh_token::bytea), 'hex') "
+            "WHERE refresh_token_hash IS NULL",
+            "CREATE INDEX IF NOT EXISTS ix_token_access_token_hash ON token (access_token_hash)",
+            "CREATE INDEX IF NOT EXISTS ix_token_refresh_token_hash ON token (refresh_token_hash)",
+            "CREATE INDEX IF NOT EXISTS ix_token_created_date ON token (created_date)",
+        ],
+    ),
+    Migration(3, "node_indexes", upgrade=create_node_indexes, transactional=False),
+    Migration(4, "geocode_cache", upgrade=create_geocode_cache),
+    Migration(5, "import_jobs", upgrade=create_import_jobs),
+    Migration(6, "sequence_counters", upgrade=create_sequence_counters),
+    Migration(7, "readings", upgrade=create_readings),
+    Migration(
+        8,
+        "geocode_cache_bigint_keys",
+        [
+            "ALTER TABLE geocode_cache ALTER COLUMN lat_key TYPE BIGINT, "
+            "ALTER COLUMN long_key TYPE BIGINT",
+        ],
+    ),
+    Migration(
+        9,
+        "import_job_claims",
+        [
+            "ALTER TABLE import_jobs ADD COLUMN IF NOT EXISTS claim VARCHAR(36)",
+            "ALTER TABLE import_job_items ALTER COLUMN name TYPE TEXT, "
+            "ALTER COLUMN sensor_type TYPE TEXT",
+        ],
+    ),
+]
+"""Every migration, in the order they are applied"""
+
+
+def ensure_version_table(connection):
+    """Creates the schema_migrations table if it does not exist"""
+    connection.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR(100) NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL DEFAULT now())"
+        )
+    )
+
+
+def applied_versions(connection) -> set:
+    """Returns the versions recorded in schema_migrations"""
+    return {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def record_version(connection, migration: Migration):
+    """Marks a migration as applied"""
+    connection.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+        {"version": migration.version, "name": migration.name},
+    )
+
+
+def upgrade(engine, target: int = None) -> list:
+    """
+    Applies every pending migration up to target, or all of them.
+
+    A Postgres advisory lock makes concurrent runs wait for each other instead of racing.
+
+    Returns:
+        list: The migrations that were applied.
+    """
+    applied = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            ensure_version_table(lock_conn)
+            done = applied_versions(lock_conn)
+            for migration in MIGRATIONS:
+                if migration.version in done:
+                    continue
+                if target is not None and migration.version > target:
+                    break
+                print(f"Applying migration {migration.version:04d} {migration.name}")
+                if migration.transactional:
+                    with engine.begin() as conn:
+                        migration.apply(conn)
+                        record_version(conn, migration)
+                else:
+                    migration.apply(lock_conn)
+                    record_version(lock_conn, migration)
+                applied.append(migration)
+        finally:
+            lock_conn.execute(
+                text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID}
+            )
+    return applied
+
+
+def pending(engine) -> list:
+    """Returns the migrations that have not been applied yet"""
+    with engine.begin() as conn:
+        ensure_version_table(conn)
+        done = applied_versions(conn)
+    return [migration for migration in MIGRATIONS if migration.version not in done]
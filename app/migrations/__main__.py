@@ -0,0 +1,37 @@
+"""
+Command line entry point of the schema migrations.
+
+Usage:
+    python -m app.migrations upgrade [--target VERSION]
+    python -m app.migrations status
+"""
+
+import argparse
+
+from app.database import engine
+from app.migrations import MIGRATIONS, pending, upgrade
+
+
+def main():
+    """Parses the command line and runs the requested command"""
+    parser = argparse.ArgumentParser(prog="python -m app.migrations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade", help="apply pending migrations")
+    upgrade_parser.add_argument(
+        "--target", type=int, default=None, help="stop after this version"
+    )
+    commands.add_parser("status", help="list applied and pending migrations")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = upgrade(engine, target=args.target)
+        print(f"{len(applied)} migration(s) applied")
+    else:
+        waiting = {migration.version for migration in pending(engine)}
+        for migration in MIGRATIONS:
+            state = "pending" if migration.version in waiting else "applied"
+            print(f"{migration.version:04d} {migration.name}: {state}")
+
+
+if __name__ == "__main__":
+    main()
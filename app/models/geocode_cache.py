@@ -0,0 +1,28 @@
+"""
+This module defines the Geocode Cache model.
+"""
+
+import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from app.database import Base
+
+
+class GeocodeCache(Base):
+    """
+    This class defines the Geocode Cache model, the pincodes resolved so far by quantized coordinates.
+    """
+
+    __tablename__ = "geocode_cache"
+
+    precision = Column(Integer, primary_key=True)
+    """Number of decimal places kept from the coordinates"""
+    lat_key = Column(BigInteger, primary_key=True)
+    """round(latitude * 10 ** precision)"""
+    long_key = Column(BigInteger, primary_key=True)
+    """round(longitude * 10 ** precision)"""
+    pincode = Column(String(20), nullable=True)
+    """NULL when no pincode was found for these coordinates, retried after GEOCODE_NEGATIVE_TTL seconds"""
+    created_date = Column(DateTime, default=datetime.datetime.now)
+
+    def __repr__(self):
+        return f"<GeocodeCache ({self.lat_key}, {self.long_key})e-{self.precision} = {self.pincode}>"
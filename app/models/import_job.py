@@ -0,0 +1,66 @@
+"""
+This module defines the Import Job and Import Job Item models.
+"""
+
+import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, Index
+from app.database import Base
+
+
+class ImportJob(Base):
+    """
+    This class defines the Import Job model, a bulk import processed in the background.
+    """
+
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String(20), nullable=False)
+    """json or csv"""
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    """queued, running, done or failed"""
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    created = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    invalid = Column(Integer, nullable=False, default=0)
+    error = Column(String(500), nullable=True)
+    created_by = Column(Integer, nullable=True)
+    created_date = Column(DateTime, default=datetime.datetime.now)
+    heartbeat = Column(DateTime, nullable=True)
+    """Last time the worker running the job reported it is alive"""
+    claim = Column(String(36), nullable=True)
+    """Random token of the latest claim, a worker that lost its claim stops writing"""
+    finished_date = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ImportJob {self.id} {self.status} {self.processed}/{self.total}>"
+
+
+class ImportJobItem(Base):
+    """
+    This class defines the Import Job Item model, one node of an import job and its result.
+    """
+
+    __tablename__ = "import_job_items"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(
+        Integer, ForeignKey("import_jobs.id", ondelete="CASCADE"), nullable=False
+    )
+    position = Column(Integer, nullable=False)
+    """Index of the node in the uploaded payload"""
+    # Unbounded, the length of a name is checked when the node is imported
+    name = Column(Text, nullable=True)
+    sensor_type = Column(Text, nullable=True)
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    """pending, inserted (node stored, descriptor not written yet), created, failed or invalid"""
+    error = Column(String(500), nullable=True)
+
+    __table_args__ = (
+        Index("ix_import_job_items_job_id_status_position", "job_id", "status", "position"),
+    )
+
+    def __repr__(self):
+        return f"<ImportJobItem {self.job_id}:{self.position} {self.status}>"
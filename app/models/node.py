@@ -2,7 +2,7 @@
 This module defines the Node model.
 """
 
-from sqlalchemy import Column, Integer, String, Float, ARRAY, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ARRAY, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -27,10 +27,21 @@ class Node(Base):
     location = Column(String(100), nullable=True)
     area = Column(String(100), nullable=True)
     orid = Column(String(50), nullable=False)
-    token_num = Column(Integer, nullable=True)
-    node_name = Column(String(50), nullable=True)
+    token_num = Column(Integer, nullable=True, index=True)
+    node_name = Column(String(50), nullable=True, index=True)
     node_data_orid = Column(String(50), nullable=True)
-    name = Column(String(50), nullable=False)
+    name = Column(String(50), nullable=False, index=True)
+
+    __table_args__ = (
+        # deploy_token looks nodes up by position within a sensor type
+        Index("ix_nodes_sensor_type_id_lat_long", "sensor_type_id", "lat", "long"),
+        # reserve_sensor_node_numbers seeds its counter with the highest number of a sensor type
+        Index(
+            "ix_nodes_sensor_type_id_sensor_node_number",
+            "sensor_type_id",
+            "sensor_node_number",
+        ),
+    )
 
     def __repr__(self):
         return f"<Node {self.id}>"  # TODO: Return resource name
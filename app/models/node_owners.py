@@ -17,5 +17,5 @@ class NodeOwners(Base):
     __tablename__ = "node_owners"
 
     id = Column(Integer, primary_key=True)
-    node_id = Column(Integer, nullable=False)
-    vendor_id = Column(Integer, ForeignKey("users.id"))
+    node_id = Column(Integer, nullable=False, index=True)
+    vendor_id = Column(Integer, ForeignKey("users.id"), index=True)
@@ -0,0 +1,33 @@
+"""
+This module defines the Reading model.
+"""
+
+from sqlalchemy import Column, BigInteger, Integer, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from app.database import Base
+
+
+class Reading(Base):
+    """
+    This class defines the Reading model, a copy of every reading ingested, for history queries.
+
+    The table is partitioned by month on ts, see app.utils.timeseries.
+    """
+
+    __tablename__ = "readings"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    ts = Column(DateTime, primary_key=True)
+    """Creation time of the content instance, in UTC"""
+    node_id = Column(Integer, nullable=False)
+    sensor_type_id = Column(Integer, nullable=False)
+    values = Column(JSONB, nullable=False)
+    """The values of the reading, ordered as the sensor type parameters"""
+
+    __table_args__ = (
+        Index("ix_readings_node_id_ts", "node_id", "ts"),
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
+
+    def __repr__(self):
+        return f"<Reading node={self.node_id} ts={self.ts}>"
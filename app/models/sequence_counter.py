@@ -0,0 +1,21 @@
+"""
+This module defines the Sequence Counter model.
+"""
+
+from sqlalchemy import Column, BigInteger, String
+from app.database import Base
+
+
+class SequenceCounter(Base):
+    """
+    This class defines the Sequence Counter model, the last number handed out by each named sequence.
+    """
+
+    __tablename__ = "sequence_counters"
+
+    name = Column(String(100), primary_key=True)
+    """e.g. sensor_node_number:3 for the node numbers of sensor type 3"""
+    value = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<SequenceCounter {self.name} = {self.value}>"
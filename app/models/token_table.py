@@ -1,9 +1,16 @@
 """This module defines the TokenTable class."""
 import datetime
+import hashlib
 from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy.orm import validates
 from app.database import Base
 
 
+def token_digest(token: str) -> str:
+    """Return the fixed-length SHA-256 hex digest used to look up a token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 class TokenTable(Base):
     """This class represents the token table in the database."""
 
@@ -11,8 +18,12 @@ class TokenTable(Base):
     user_id = Column(Integer)
     access_token = Column(String(450), primary_key=True)
     refresh_token = Column(String(450), nullable=False)
+    access_token_hash = Column(String(64), index=True)
+    """SHA-256 of access_token, kept in sync on assignment"""
+    refresh_token_hash = Column(String(64), index=True)
+    """SHA-256 of refresh_token, kept in sync on assignment"""
     status = Column(Boolean)
-    created_date = Column(DateTime, default=datetime.datetime.now)
+    created_date = Column(DateTime, default=datetime.datetime.now, index=True)
 
     def __init__(self, user_id, access_token, refresh_token, status):
         self.user_id = user_id
@@ -20,6 +31,11 @@ class TokenTable(Base):
         self.refresh_token = refresh_token
         self.status = status
 
+    @validates("access_token", "refresh_token")
+    def _update_digest(self, key, value):
+        setattr(self, f"{key}_hash", token_digest(value))
+        return value
+
     def __repr__(self):
         return f"<TokenTable(user_id={self.user_id}, access_token={self.access_token}, \
     refresh_token={self.refresh_token}, status={self.status})>"
@@ -1,5 +1,9 @@
+import hmac
 import xml.etree.ElementTree as ET
+
+import httpx
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.auth.auth import (
@@ -8,66 +12,48 @@ from app.auth.auth import (
 )
 from app.database import get_session
 from app.utils.om2m_lib import Om2m
-from app.utils.utils import get_vertical_name, create_hash
+from app.utils.om2m_async import AsyncOm2m
+from app.utils.node_context import NodeContext, get_node_context
+from app.utils import cin_codec
+from app.utils.latest_cache import remember_latest
+from app.utils.timeseries import reading_row, record_readings
 from app.schemas.cin import (
     ContentInstance,
     ContentInstanceGetAll,
     ContentInstanceDelete,
+    ContentInstanceResult,
 )
 from app.models.node import Node as DBNode
-from app.models.node_owners import NodeOwners as DBNodeOwners
-from app.models.user import User as DBUser
-from app.models.sensor_types import SensorTypes as DBSensorType
-from app.config.settings import OM2M_URL, MOBIUS_XM2MRI, JWT_SECRET_KEY
+from app.config.settings import (
+    OM2M_URL,
+    MOBIUS_XM2MRI,
+    CIN_BATCH_MAX_SIZE,
+    LATEST_NOTIFY_SECRET,
+    TIMESERIES_ENABLED,
+)
 
 router = APIRouter()
 
 om2m = Om2m(MOBIUS_XM2MRI, OM2M_URL)
+async_om2m = AsyncOm2m(MOBIUS_XM2MRI, OM2M_URL)
 
 
-@router.post("/create/{token_id}")
-def create_cin(
-    cin: ContentInstance,
-    token_id: str,
-    request: Request,
-    session: Session = Depends(get_session),
-    current_user=None,
-):
+def get_node_for_token(token_id: str, request: Request, session: Session) -> NodeContext:
     """
-    Create a CIN (Content Instance) with the given name and labels.
+    Resolves the node behind a token and checks the vendor API token sent with the request.
 
     Args:
-        cin (ContentInstance): The content instance object containing the path, content, and labels.
         token_id (str): The token ID.
         request (Request): The HTTP request object.
-        session (Session, optional): The database session. Defaults to Depends(get_session).
+        session (Session): The database session.
 
     Returns:
-        int: The status code of the operation.
+        NodeContext: The cached node, vendor, vertical and sensor type details.
 
     Raises:
-        HTTPException: If the node token is not found, CIN already exists, or there is an error creating CIN.
+        HTTPException: If the node token is not found, no vendor is assigned or the API token is invalid.
     """
-    _, _ = current_user, request
-    node = session.query(DBNode).filter(DBNode.token_num == token_id).first()
-    if node is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Node token not found"
-        )
-
-    # Check if vendor is assigned to the node
-    vendor = (
-        session.query(DBUser.id, DBUser.user_type, DBUser.username, DBUser.email)
-        .join(DBNodeOwners, DBNodeOwners.vendor_id == DBUser.id)
-        .filter(DBNodeOwners.node_id == node.id)
-        .first()
-    )
-
-    if vendor is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Vendor not assigned to the node",
-        )
+    node = get_node_context(token_id, session)
 
     # Check Auth
     # get Bearer Token from headers
@@ -79,62 +65,54 @@ def create_cin(
         )
     bearer_auth_token = bearer_auth_token.split(" ")[1]
 
-    # Hash
-    hash_token = create_hash([vendor.email, node.node_data_orid], JWT_SECRET_KEY)
-    if bearer_auth_token != hash_token:
+    if bearer_auth_token != node.api_token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authorization token is invalid",
         )
+    return node
 
-    vertical_name = get_vertical_name(node.sensor_type_id, session)
-    print(node.orid, vertical_name)
 
-    sensor_type = (
-        session.query(DBSensorType)
-        .filter(DBSensorType.id == node.sensor_type_id)
-        .first()
-    )
-    print(cin, sensor_type)
+@router.post("/create/{token_id}")
+async def create_cin(
+    cin: ContentInstance,
+    token_id: str,
+    request: Request,
+    session: Session = Depends(get_session),
+    current_user=None,
+):
+    """
+    Create a CIN (Content Instance) with the given name and labels.
+
+    Args:
+        cin (ContentInstance): The content instance object containing the path, content, and labels.
+        token_id (str): The token ID.
+        request (Request): The HTTP request object.
+        session (Session, optional): The database session. Defaults to Depends(get_session).
+
+    Returns:
+        int: The status code of the operation.
+
+    Raises:
+        HTTPException: If the node token is not found, CIN already exists, or there is an error creating CIN.
+    """
+    _ = current_user
+    node = await run_in_threadpool(get_node_for_token, token_id, request, session)
+
     cin = cin.dict()
-    con = []
-    # check if all of sensor_type.paramaters are in cin
-    # if not, raise error
-    # if it is then check if datatype matches with sensor_type.data_tpes[idx]
-    for idx, param in enumerate(sensor_type.parameters):
-        print(idx, param, cin, param in cin)
-        if param not in cin:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Missing parameter " + param,
-            )
-        expected_type = sensor_type.data_types[idx]
-        if expected_type == "str" or expected_type == "string":
-            expected_type = str
-        elif expected_type == "int":
-            expected_type = int
-        elif expected_type == "float":
-            expected_type = float
-
-        if not isinstance(cin[param], expected_type):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Wrong data type for "
-                + param
-                + ". Expected "
-                + str(sensor_type.data_types[idx])
-                + " but got "
-                + str(type(cin[param])),
-            )
-        con.append(str(cin[param]))
-        print(con)
-    response = om2m.create_cin(
-        vertical_name,
+    values = node.validator(cin)
+    response = await async_om2m.create_cin(
+        node.vertical_name,
         node.node_name,
-        str(con),
+        cin_codec.encode(values),
         lbl=list(cin.keys()),
     )
     if response.status_code == 201:
+        body = response.json()
+        remember_latest(node.node_name, body)
+        if TIMESERIES_ENABLED:
+            row = reading_row(node.node_id, node.sensor_type_id, values, body)
+            await run_in_threadpool(record_readings, [row])
         return response.status_code
     elif response.status_code == 409:
         raise HTTPException(status_code=409, detail="CIN already exists")
@@ -145,6 +123,140 @@ def create_cin(
         )
 
 
+@router.post("/create-batch/{token_id}", response_model=list[ContentInstanceResult])
+async def create_cin_batch(
+    cins: list[ContentInstance],
+    token_id: str,
+    request: Request,
+    session: Session = Depends(get_session),
+    current_user=None,
+):
+    """
+    Create many CINs (Content Instances) for one node in a single request.
+
+    The node, vendor API token and sensor type are checked once for the whole batch.
+    Every reading is validated on its own, so one bad reading does not reject the rest
+    of the batch. The valid ones are sent to Mobius in the order they were given.
+
+    Args:
+        cins (list[ContentInstance]): The readings to store, oldest first.
+        token_id (str): The token ID.
+        request (Request): The HTTP request object.
+        session (Session, optional): The database session. Defaults to Depends(get_session).
+
+    Returns:
+        list: One ContentInstanceResult per reading, in the order they were sent.
+
+    Raises:
+        HTTPException: If the batch is empty or too large, or the node token or API token is invalid.
+    """
+    _ = current_user
+    if len(cins) == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="No readings to create"
+        )
+    if len(cins) > CIN_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Create less than {CIN_BATCH_MAX_SIZE} readings at one time",
+        )
+
+    node = await run_in_threadpool(get_node_for_token, token_id, request, session)
+
+    results = [None] * len(cins)
+    pending = []
+    for idx, cin in enumerate(cins):
+        cin = cin.dict()
+        try:
+            values = node.validator(cin)
+        except HTTPException as e:
+            results[idx] = ContentInstanceResult(
+                index=idx, status_code=e.status_code, detail=e.detail
+            )
+            continue
+        pending.append((idx, values, list(cin.keys())))
+
+    # Sent one after another, Mobius stamps and evicts readings in the order they were given
+    rows = []
+    last_created = None
+    for idx, values, lbl in pending:
+        try:
+            response = await async_om2m.create_cin(
+                node.vertical_name, node.node_name, cin_codec.encode(values), lbl=lbl
+            )
+            status_code = response.status_code
+        except httpx.HTTPError:
+            status_code = status.HTTP_502_BAD_GATEWAY
+        if status_code == 201:
+            detail = "CIN created"
+            last_created = response.json()
+            rows.append(reading_row(node.node_id, node.sensor_type_id, values, last_created))
+        elif status_code == 409:
+            detail = "CIN already exists"
+        else:
+            detail = "Error creating CIN"
+        results[idx] = ContentInstanceResult(
+            index=idx, status_code=status_code, detail=detail
+        )
+
+    if last_created is not None:
+        remember_latest(node.node_name, last_created)
+
+    # One insert for the whole batch
+    if TIMESERIES_ENABLED:
+        await run_in_threadpool(record_readings, rows)
+
+    return results
+
+
+def notified_node_name(sur: str):
+    """
+    Returns the node a subscription belongs to, from its path, or None.
+
+    Subscriptions for readings live under the Data container: <AE>/<node>/Data/<subscription>.
+    """
+    parts = [part for part in sur.split("/") if part]
+    if "Data" not in parts:
+        return None
+    idx = len(parts) - 1 - parts[::-1].index("Data")
+    return parts[idx - 1] if idx > 0 else None
+
+
+@router.post("/notify")
+async def notify(request: Request, secret: str = None):
+    """
+    Receives Mobius notifications for new readings and caches them as the latest of their node.
+
+    Subscribe a node's Data container with nu set to /cin/notify?secret=<LATEST_NOTIFY_SECRET>.
+    The route is disabled when LATEST_NOTIFY_SECRET is not set.
+
+    Raises:
+        HTTPException: If the route is disabled, the secret is wrong or the body is not JSON.
+    """
+    if not LATEST_NOTIFY_SECRET:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if secret is None or not hmac.compare_digest(secret, LATEST_NOTIFY_SECRET):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid secret")
+    try:
+        body = await request.json()
+        sgn = body["m2m:sgn"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Not a notification"
+        ) from None
+
+    # Sent once when the subscription is created
+    if sgn.get("vrq"):
+        return {"status": "verified"}
+
+    rep = (sgn.get("nev") or {}).get("rep") or {}
+    node_name = notified_node_name(sgn.get("sur") or "")
+    if node_name is None or "m2m:cin" not in rep:
+        return {"status": "ignored"}
+    remember_latest(node_name, {"m2m:cin": rep["m2m:cin"]})
+    return {"status": "cached"}
+
+
 @router.delete("/delete")
 @token_required
 @admin_required
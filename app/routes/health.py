@@ -0,0 +1,50 @@
+"""
+This module defines the liveness and readiness probes of a worker.
+"""
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.bootstrap import check_database
+from app.utils.om2m_async import AsyncOm2m
+from app.config.settings import OM2M_URL
+
+router = APIRouter()
+
+
+@router.get("/live")
+async def live():
+    """
+    Reports that the worker is running. Touches neither the database nor Mobius.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready():
+    """
+    Reports whether the worker can reach the database and Mobius.
+
+    Raises:
+        HTTPException: 503 with the state of each dependency, "ok" or "unavailable", if
+            one of them is unreachable.
+    """
+    # Callers are unauthenticated, the reasons are only logged
+    checks = {"database": "ok", "mobius": "ok"}
+    try:
+        await run_in_threadpool(check_database)
+    except Exception as e:
+        print(f"Readiness: database unavailable: {e}")
+        checks["database"] = "unavailable"
+    try:
+        response = await AsyncOm2m.client().get(OM2M_URL, timeout=5)
+        if response.status_code in (404, 503):
+            print(f"Readiness: Mobius returned {response.status_code}")
+            checks["mobius"] = "unavailable"
+    except Exception as e:
+        print(f"Readiness: Mobius unavailable: {e!r}")
+        checks["mobius"] = "unavailable"
+
+    if any(value != "ok" for value in checks.values()):
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=checks)
+    return {"status": "ok", **checks}
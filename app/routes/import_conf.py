@@ -1,7 +1,11 @@
 """
 This module defines the user routes for importing the configuration files.
 """
-from fastapi import APIRouter, Depends, Request, File, UploadFile
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, File, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.utils.om2m_lib import Om2m
 from app.utils.create import (
@@ -12,11 +16,12 @@ from app.utils.create import (
 
 from app.schemas.import_conf import Vertical, Area
 
-from app.models.sensor_types import SensorTypes as DBSensorType
 from app.database import get_session
 from app.config.settings import OM2M_URL, MOBIUS_XM2MRI
+import codecs
 import csv
-from io import StringIO
+from itertools import islice
+from typing import Iterator
 
 from app.auth.auth import (
     token_required,
@@ -27,115 +32,150 @@ from app.auth.auth import (
     token_required,
     admin_required,
 )
-from app.database import get_session
-from app.utils.om2m_lib import Om2m
-from app.utils.create import create_node
-from app.schemas.nodes import NodeCreate
+from app.models.import_job import ImportJob
+from app.utils.import_jobs import FINISHED, create_job, submit, job_status, job_results
+from app.utils.pagination import Page
 
 router = APIRouter()
 om2m = Om2m(MOBIUS_XM2MRI, OM2M_URL)
 
+# Seconds between two progress events of /jobs/{job_id}/stream
+STREAM_INTERVAL = 1
+
+
 @router.post("/import")
 @token_required
 @admin_required
-def import_conf(
+async def import_conf(
     request: Request, payload: dict, session: Session = Depends(get_session), current_user=None
 ):
     """
     Import the configuration files.
+
+    The nodes are imported by a background job, poll /import/jobs/{job_id} for its progress.
     """
 
-    _ = current_user
+    _ = request
     try:
         nodes = payload["nodes"]
     except KeyError:
         return {"error": "Missing 'nodes' key in the JSON payload"}
 
     if len(nodes) > 5000: return {"error": "Import less than 5000 nodes at one time!"}
-    sensor_types = session.query(DBSensorType).all()  # get all the sensors
-    # sensor type field from bulk import, convert this to id since thats what create node expects
-    sensor_name_to_id = {sensor_type.res_name: sensor_type.id for sensor_type in sensor_types}
-
-    created_nodes, failed_nodes, invalid_sensor_nodes = [], [], []
-
-    for node in nodes:
-        sensor_name = node['sensor_type']
-        if sensor_name in sensor_name_to_id:
-            node['sensor_type_id'] = sensor_name_to_id[sensor_name]
-        else:
-            print(f"{node['name']} --> {sensor_name} not found")
-            invalid_sensor_nodes.append({"node": node, "error": f"Sensor type '{sensor_name}' not found"})
-            continue  
-
-        node_data = NodeCreate(
-            sensor_type_id=node['sensor_type_id'],
-            latitude=node['latitude'],
-            longitude=node['longitude'],
-            area=node['area'],
-            name=node['name']
-        )
-        result = create_node(node_data, request, session, current_user, node_data=node)
-        print(f"{node['name']} --> {result['message']}")
-
-        if result["status"] == "success":
-            created_nodes.append(result["node"])
-        else:
-            failed_nodes.append({"node": node, "error": result["message"]})
-
-    return {
-        "created_nodes": created_nodes,
-        "failed_nodes": failed_nodes,
-        "invalid_sensor_nodes": invalid_sensor_nodes
-    }
+
+    job_id, total = await run_in_threadpool(create_job, nodes, session, "json", current_user.id)
+    submit(job_id)
+    return {"job_id": job_id, "status": "queued", "total": total}
+
+CSV_FIELDS = ['latitude', 'longitude', 'area', 'sensor_type', 'domain', 'name']
+
+
+def read_csv_nodes(file) -> Iterator[dict]:
+    """
+    Yields the nodes of a CSV upload one row at a time, decoding the file as it is read.
+
+    Blank rows are skipped, missing trailing values are None.
+    """
+    yield from csv.DictReader(codecs.iterdecode(file, 'utf-8'), fieldnames=CSV_FIELDS)
+
 
 @router.post("/import_csv")
 @token_required
 @admin_required
-def import_csv(
-    request: Request, file: UploadFile = File(...), session: Session = Depends(get_session), current_user=None
+async def import_csv(
+    request: Request,
+    file: UploadFile = File(...),
+    stream: bool = False,
+    session: Session = Depends(get_session),
+    current_user=None,
 ):
     """
-    Import nodes from a CSV file.
+    Import nodes from a CSV file, as a background job like /import.
+
+    The upload is read and stored in chunks. With stream=true there is no limit on the
+    number of rows, for offline-prepared files of 100k+ nodes.
     """
-    _ = current_user
+    _ = request
+    nodes = read_csv_nodes(file.file)
     try:
-        csv_data = file.file.read().decode('utf-8')
-    except Exception as e:
+        if not stream:
+            # Reading and parsing the upload blocks, keep it off the event loop
+            nodes = await run_in_threadpool(list, islice(nodes, 5001))
+            if len(nodes) > 5000: return {"error": "Import less than 5000 nodes at one time!"}
+        job_id, total = await run_in_threadpool(create_job, nodes, session, "csv", current_user.id)
+    except (UnicodeDecodeError, csv.Error) as e:
         return {"error": f"Error reading CSV file: {str(e)}"}
 
-    reader = csv.DictReader(StringIO(csv_data), fieldnames=['latitude', 'longitude', 'area', 'sensor_type', 'domain', 'name'])
-    nodes = list(reader)
-    if len(nodes) > 5000: return {"error": "Import less than 5000 nodes at one time!"}
-    
-    sensor_types = session.query(DBSensorType).all()
-    sensor_name_to_id = {sensor_type.res_name: sensor_type.id for sensor_type in sensor_types}
-
-    created_nodes, failed_nodes, invalid_sensor_nodes = [], [], []
-
-    for node in nodes:
-        sensor_name = node['sensor_type']
-        if sensor_name in sensor_name_to_id:
-            node['sensor_type_id'] = sensor_name_to_id[sensor_name]
-        else:
-            invalid_sensor_nodes.append({"node": node, "error": f"Sensor type '{sensor_name}' not found"})
-            continue
-
-        node_data = NodeCreate(
-            sensor_type_id=node['sensor_type_id'],
-            latitude=float(node['latitude']),
-            longitude=float(node['longitude']),
-            area=node['area'],
-            name=node['name']
-        )
-        result = create_node(node_data, request, session, current_user, node_data=node)
-
-        if result["status"] == "success":
-            created_nodes.append(result["node"])
-        else:
-            failed_nodes.append({"node": node, "error": result["message"]})
-
-    return {
-        "created_nodes": created_nodes,
-        "failed_nodes": failed_nodes,
-        "invalid_sensor_nodes": invalid_sensor_nodes
-    }
\ No newline at end of file
+    submit(job_id)
+    return {"job_id": job_id, "status": "queued", "total": total}
+
+
+def get_job(job_id: int, session: Session) -> ImportJob:
+    """
+    Returns the import job with the given id.
+
+    Raises:
+        HTTPException: If the job does not exist.
+    """
+    job = session.query(ImportJob).filter(ImportJob.id == job_id).first()
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return job
+
+
+def read_job_status(job_id: int, session: Session) -> dict:
+    """Returns the progress of a job, releasing the connection until the next poll"""
+    try:
+        return job_status(get_job(job_id, session))
+    finally:
+        session.close()
+
+
+@router.get("/jobs/{job_id}")
+@token_required
+@admin_required
+def get_import_job(
+    job_id: int,
+    request: Request,
+    response: Response,
+    results: bool = False,
+    session: Session = Depends(get_session),
+    current_user=None,
+):
+    """
+    Returns the progress of an import job, and the per-node results so far when results is true.
+
+    The results are paginated with after and limit, see app.utils.pagination.
+    """
+    _ = current_user
+    job = job_status(get_job(job_id, session))
+    if results:
+        job.update(job_results(job_id, session, Page(request, response)))
+    return job
+
+
+@router.get("/jobs/{job_id}/stream")
+@token_required
+@admin_required
+async def stream_import_job(
+    job_id: int, request: Request, session: Session = Depends(get_session), current_user=None
+):
+    """
+    Streams the progress of an import job as server-sent events, until the job is finished.
+    """
+    _ = current_user
+    job = await run_in_threadpool(read_job_status, job_id, session)
+
+    async def events():
+        nonlocal job
+        last = None
+        while True:
+            if job != last:
+                yield f"data: {json.dumps(job, default=str)}\n\n"
+                last = job
+            if job["status"] in FINISHED or await request.is_disconnected():
+                break
+            await asyncio.sleep(STREAM_INTERVAL)
+            job = await run_in_threadpool(read_job_status, job_id, session)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
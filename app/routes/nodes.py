@@ -1,5 +1,8 @@
-import ast
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+import asyncio
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.schemas.nodes import NodeCreate
 from app.models.node import Node as DBNode
@@ -10,29 +13,43 @@ from app.auth.auth import (
 )
 from app.database import get_session
 from app.utils.om2m_lib import Om2m
+from app.utils.om2m_async import AsyncOm2m
 from app.utils.utils import (
     get_vertical_name,
     get_sensor_type_name,
-    get_next_sensor_node_number,
+    release_sensor_node_numbers,
+    reserve_sensor_node_numbers,
     get_node_code,
     create_hash,
+    to_mobius_time,
 )
+from app.utils.node_context import invalidate_node_context
+from app.utils.pagination import Page
+from app.utils import cin_codec
+from app.utils.latest_cache import get_latest, remember_latest, forget_latest
 from app.utils.utils import (
     get_node_coordinates_by_id,
     get_node_coordinates_by_name,
 )
-from app.schemas.nodes import NodeCreate, NodeAssign
+from app.schemas.nodes import NodeCreate, NodeAssign, NodesLatest
 from app.models.vertical import Vertical as DBVertical
 from app.models.node import Node as DBNode
 from app.models.user import User as DBUser
 from app.models.user_types import UserType
 from app.models.node_owners import NodeOwners as DBNodeOwners
 from app.models.sensor_types import SensorTypes as DBSensorType
-from app.config.settings import OM2M_URL, MOBIUS_XM2MRI, JWT_SECRET_KEY
+from app.config.settings import (
+    OM2M_URL,
+    MOBIUS_XM2MRI,
+    JWT_SECRET_KEY,
+    LATEST_BATCH_MAX_SIZE,
+    LATEST_FETCH_CONCURRENCY,
+)
 
 router = APIRouter()
 
 om2m = Om2m(MOBIUS_XM2MRI, OM2M_URL)
+async_om2m = AsyncOm2m(MOBIUS_XM2MRI, OM2M_URL)
 
 
 @router.post("/create-node", status_code=201)
@@ -89,8 +106,14 @@ def create_node(
         )
 
     print(vert_name, node.sensor_type_id, node.latitude, node.longitude)
+    sensor_node_number = reserve_sensor_node_numbers(node.sensor_type_id)
     res_id = get_node_code(
-        vert_name, node.sensor_type_id, node.latitude, node.longitude, session
+        vert_name,
+        node.sensor_type_id,
+        node.latitude,
+        node.longitude,
+        session,
+        sensor_node_number=sensor_node_number,
     )
 
     response = om2m.create_container(res_id, f"{vert_name}", labels=[vert_name, res_id])
@@ -108,9 +131,7 @@ def create_node(
         new_node = DBNode(
             labels=[vert_name, res_id],
             sensor_type_id=node.sensor_type_id,
-            sensor_node_number=get_next_sensor_node_number(
-                node.sensor_type_id, session
-            ),
+            sensor_node_number=sensor_node_number,
             lat=node.latitude,
             long=node.longitude,
             location=node.area,
@@ -166,6 +187,8 @@ def create_node(
         raise HTTPException(status_code=409, detail="Node already exists")
     else:
         print(response.status_code)
+        # The container was not created, its number can be handed back
+        release_sensor_node_numbers(node.sensor_type_id, sensor_node_number)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error creating node",
@@ -239,6 +262,7 @@ def assign_vendor(
 
     session.add(node_owner)
     session.commit()
+    invalidate_node_context(node_to_assign.token_num)
 
     raise HTTPException(status_code=201, detail="Node assigned to vendor")
 
@@ -293,56 +317,76 @@ def get_vendor(
     return {**vendor._asdict(), "api_token": api_token}
 
 
+NODE_FIELDS = {
+    "node_name": DBNode.node_name,
+    "orid": DBNode.orid,
+    "node_data_orid": DBNode.node_data_orid,
+    "area": DBNode.area,
+    "res_name": DBSensorType.res_name,
+    "sensor_node_number": DBNode.sensor_node_number,
+    "lat": DBNode.lat,
+    "long": DBNode.long,
+    "token_num": DBNode.token_num,
+    "name": DBNode.name,
+}
+"""Fields of the node listing, by name"""
+
+
 @router.get("/{path}")
 @token_required
 def get_node(
     path: str,
     request: Request,
+    response: Response,
     session: Session = Depends(get_session),
     current_user=None,
 ):
     """
-    Retrieves the node with the given name.
+    Retrieves the nodes of the vertical with the given name, one page at a time.
 
     Args:
         path (str): The path of the node.
         request (Request): The HTTP request object.
+        response (Response): The response, carrying the pagination headers.
         session (Session, optional): The database session. Defaults to Depends(get_session).
 
+    Query parameters:
+        area, sensor_type: Only return nodes of this area or sensor type.
+        after, limit, fields, count: See app.utils.pagination.
+
     Returns:
-        dict: The node object.
+        list: The nodes of the page.
     """
-    _, _ = current_user, request
+    _ = current_user
 
-    nodes = (
+    query = (
         session.query(DBNode)
         .join(DBSensorType, DBSensorType.id == DBNode.sensor_type_id)
         .join(DBVertical, DBVertical.id == DBSensorType.vertical_id)
         .filter(DBVertical.res_name == path)
-        .with_entities(
-            DBNode.node_name,
-            DBNode.orid,
-            DBNode.node_data_orid,
-            DBNode.area,
-            DBSensorType.res_name,
-            DBNode.sensor_node_number,
-            DBNode.lat,
-            DBNode.long,
-            DBNode.token_num,
-            DBNode.name
-        )
-        .all()
     )
-
-    return nodes
+    area = request.query_params.get("area")
+    if area:
+        query = query.filter(DBNode.area == area)
+    sensor_type = request.query_params.get("sensor_type")
+    if sensor_type:
+        query = query.filter(DBSensorType.res_name == sensor_type)
+
+    return Page(request, response).fetch(
+        query, DBNode.id, NODE_FIELDS, default=list(NODE_FIELDS)
+    )
 
 
 # get nodename from path parameter
 @router.get("/get-node/{path}")
 @token_required
-def get_nodes(
+async def get_nodes(
     request: Request,
     path: str,
+    start: str = None,
+    end: str = None,
+    limit: int = None,
+    order: str = None,
     current_user=None,
     session: Session = Depends(get_session),
 ):
@@ -352,6 +396,12 @@ def get_nodes(
     Parameters:
     - node (NodeGetAll): The node object containing the path to retrieve the subcontainers from.
     - request (Request): The request object.
+    - start, end (optional): Only return content instances created in this window, given as
+      ISO 8601 or YYYYMMDDTHHMMSS. Passed to Mobius as the cra and crb filter criteria.
+    - limit (optional): The maximum number of content instances Mobius returns (lim).
+    - order (optional): asc or desc, sorts the returned content instances by creation time.
+      Mobius cannot sort before applying lim, so order cannot be combined with limit;
+      narrow the window with start and end instead.
     - current_user (optional): The current user.
     - session (Session): The database session.
 
@@ -360,7 +410,38 @@ def get_nodes(
     """
     _, _ = current_user, request
 
-    cur_node = (
+    filters = {}
+    try:
+        if start is not None:
+            filters["cra"] = to_mobius_time(start)
+        if end is not None:
+            filters["crb"] = to_mobius_time(end)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start and end must be ISO 8601 or YYYYMMDDTHHMMSS times",
+        ) from None
+    if limit is not None:
+        if limit < 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="limit must be at least 1"
+            )
+        filters["lim"] = limit
+    if order not in (None, "asc", "desc"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="order must be asc or desc"
+        )
+    if order is not None and limit is not None:
+        # lim picks the window in Mobius' own order, sorting it here would not pick another
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="order cannot be combined with limit",
+        )
+    if filters:
+        # Conditional retrieval of content instances only
+        filters.update({"fu": 2, "ty": 4})
+
+    query = (
         session.query(DBNode)
         .join(DBSensorType, DBSensorType.id == DBNode.sensor_type_id)
         .join(DBVertical, DBVertical.id == DBSensorType.vertical_id)
@@ -379,8 +460,8 @@ def get_nodes(
             DBNode.token_num,
             DBVertical.res_short_name,
         )
-        .first()
     )
+    cur_node = await run_in_threadpool(query.first)
     # session.query(DBNode).filter(DBNode.node_name == path).first()
     print(path, cur_node)
     if cur_node is None:
@@ -390,11 +471,14 @@ def get_nodes(
         )
     data_orid = cur_node.node_data_orid
     print(data_orid)
-    response_ae = om2m.get_containers(
-        resource_path=cur_node.res_short_name + "/" + path
-    )
-    response = om2m.get_containers(
-        resource_path=cur_node.res_short_name + "/" + path, ri=data_orid, all=True
+    response_ae, response = await asyncio.gather(
+        async_om2m.get_containers(resource_path=cur_node.res_short_name + "/" + path),
+        async_om2m.get_containers(
+            resource_path=cur_node.res_short_name + "/" + path,
+            ri=data_orid,
+            all=True,
+            filters=filters,
+        ),
     )
 
     if response.status_code == 200:
@@ -403,12 +487,16 @@ def get_nodes(
         # Extract labels and content instances from the response
         labels = ae_node_data.get("m2m:cnt", {}).get("lbl", [])
         content_instances = all_data.get("m2m:rsp", {}).get("m2m:cin", [])
+        if order is not None:
+            content_instances = sorted(
+                content_instances, key=lambda x: x.get("ct", ""), reverse=order == "desc"
+            )
         # Prepare content instances data
-        cins = [
-            (ast.literal_eval(x["con"]), x["lt"])
-            for x in content_instances
-            if cur_node.parameters[0] not in x["con"]
+        readings = [
+            x for x in content_instances if cur_node.parameters[0] not in x["con"]
         ]
+        values = cin_codec.decode_many([x["con"] for x in readings])
+        cins = [(value, x["lt"]) for value, x in zip(values, readings)]
 
         # Merge current node data with labels and content instances
         final_data = {**cur_node, "labels": labels, "cins": cins}
@@ -420,8 +508,91 @@ def get_nodes(
         )
 
 
+@router.post("/latest")
+@token_required
+async def get_latest_cins(
+    selection: NodesLatest,
+    request: Request,
+    session: Session = Depends(get_session),
+    current_user=None,
+):
+    """
+    Retrieves the latest readings of many nodes at once.
+
+    The nodes are resolved with one query, their latest instances are read from the
+    latest-value cache and the misses are fetched from Mobius concurrently.
+
+    Args:
+        selection (NodesLatest): The node names, or the vertical and/or area of the nodes.
+
+    Returns:
+        dict: "nodes" maps every node found to {"values", "ct"}, or None when it has no
+        reading yet; values is None when the content cannot be decoded. "missing" lists
+        the requested node names that do not exist.
+
+    Raises:
+        HTTPException: If no selection is given or it matches too many nodes.
+    """
+    _, _ = current_user, request
+
+    if selection.node_names is None and not (selection.vertical or selection.area):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give node_names, or a vertical or area",
+        )
+
+    query = (
+        session.query(DBNode)
+        .join(DBSensorType, DBSensorType.id == DBNode.sensor_type_id)
+        .join(DBVertical, DBVertical.id == DBSensorType.vertical_id)
+        .with_entities(DBNode.node_name, DBVertical.res_short_name)
+    )
+    if selection.node_names is not None:
+        query = query.filter(DBNode.node_name.in_(selection.node_names))
+    if selection.vertical:
+        query = query.filter(DBVertical.res_name == selection.vertical)
+    if selection.area:
+        query = query.filter(DBNode.area == selection.area)
+    rows = await run_in_threadpool(query.limit(LATEST_BATCH_MAX_SIZE + 1).all)
+    if len(rows) > LATEST_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request less than {LATEST_BATCH_MAX_SIZE} nodes at one time",
+        )
+
+    latest = {row.node_name: get_latest(row.node_name) for row in rows}
+    semaphore = asyncio.Semaphore(LATEST_FETCH_CONCURRENCY)
+
+    async def fetch(row):
+        async with semaphore:
+            try:
+                r = await async_om2m.get_la_cin(
+                    f"{row.res_short_name}/{row.node_name}/Data"
+                )
+            except httpx.HTTPError:
+                return
+        if r.status_code == 200:
+            body = r.json()
+            remember_latest(row.node_name, body)
+            latest[row.node_name] = body
+
+    await asyncio.gather(*(fetch(row) for row in rows if latest[row.node_name] is None))
+
+    found = [
+        (node_name, body["m2m:cin"]) for node_name, body in latest.items() if body is not None
+    ]
+    # A node fed outside of this API may hold content that is not a reading
+    values = cin_codec.decode_many([cin.get("con", "null") for _, cin in found], lenient=True)
+    nodes = dict.fromkeys(latest)
+    for (node_name, cin), value in zip(found, values):
+        nodes[node_name] = {"values": value, "ct": cin.get("ct")}
+
+    missing = [name for name in selection.node_names or () if name not in latest]
+    return {"nodes": nodes, "missing": missing}
+
+
 @router.get("/get-node/{path}/latest")
-def get_latest_cin(
+async def get_latest_cin(
     path: str,
     request: Request,
     session: Session = Depends(get_session),
@@ -430,12 +601,18 @@ def get_latest_cin(
     """
     Retrieves the latest content instance for a given path.
 
+    Served from the latest-value cache when possible, see app.utils.latest_cache.
+
     Returns:
     - list: A list of dictionaries containing the "rn" and "ri" attributes of each subcontainer.
     """
     _, _ = current_user, request
 
-    cur_node = (
+    cached = get_latest(path)
+    if cached is not None:
+        return cached
+
+    query = (
         session.query(DBNode)
         .join(DBSensorType, DBSensorType.id == DBNode.sensor_type_id)
         .join(DBVertical, DBVertical.id == DBSensorType.vertical_id)
@@ -444,8 +621,8 @@ def get_latest_cin(
             DBNode.node_data_orid,
             DBVertical.res_short_name,
         )
-        .first()
     )
+    cur_node = await run_in_threadpool(query.first)
     print(path, cur_node)
     if cur_node is None:
         raise HTTPException(
@@ -457,9 +634,11 @@ def get_latest_cin(
     # We need AE-WF/WATER_QUANTITY01-0000-0001/Data
     la_url = f"{cur_node.res_short_name}/{path}/Data"
     print(la_url)
-    r = om2m.get_la_cin(la_url)
+    r = await async_om2m.get_la_cin(la_url)
     if r.status_code == 200:
-        return r.json()
+        body = r.json()
+        remember_latest(path, body)
+        return body
     elif r.status_code == 404:
         raise HTTPException(
             status_code=r.status_code,
@@ -543,8 +722,11 @@ def delete_node(
             session.query(DBNode).filter(DBNode.node_name == node_name).first()
         )
         if node_to_delete:
+            token_num = node_to_delete.token_num
             session.delete(node_to_delete)
             session.commit()
+            invalidate_node_context(token_num)
+            forget_latest(node_name)
             raise HTTPException(status_code=204, detail="Node deleted")
     else:
         raise HTTPException(
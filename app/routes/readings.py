@@ -0,0 +1,193 @@
+"""
+This module serves the history of the readings of a node from the readings table.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from sqlalchemy import Float, cast, func
+from sqlalchemy.orm import Session
+
+from app.auth.auth import token_required
+from app.database import get_session
+from app.models.node import Node as DBNode
+from app.models.reading import Reading
+from app.models.sensor_types import SensorTypes as DBSensorType
+from app.utils.utils import parse_time
+from app.config.settings import PAGE_SIZE_DEFAULT, READINGS_PAGE_MAX
+
+router = APIRouter()
+
+BUCKETS = ("minute", "hour", "day", "week", "month")
+"""Bucket sizes accepted by the aggregate route, as understood by date_trunc"""
+
+
+def get_reading_node(node_name: str, session: Session):
+    """
+    Returns the id, sensor type parameters and data types of a node.
+
+    Raises:
+        HTTPException: If the node is not found.
+    """
+    node = (
+        session.query(DBNode)
+        .join(DBSensorType, DBSensorType.id == DBNode.sensor_type_id)
+        .filter(DBNode.node_name == node_name)
+        .with_entities(DBNode.id, DBSensorType.parameters, DBSensorType.data_types)
+        .first()
+    )
+    if node is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found")
+    return node
+
+
+def filter_window(query, start: str, end: str):
+    """
+    Restricts a readings query to the readings created from start, up to but excluding end.
+
+    Raises:
+        HTTPException: If start or end is not a valid time.
+    """
+    try:
+        if start is not None:
+            query = query.filter(Reading.ts >= parse_time(start))
+        if end is not None:
+            query = query.filter(Reading.ts < parse_time(end))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start and end must be ISO 8601 or YYYYMMDDTHHMMSS times",
+        ) from None
+    return query
+
+
+@router.get("/{node_name}")
+@token_required
+def get_readings(
+    request: Request,
+    node_name: str,
+    start: str = None,
+    end: str = None,
+    limit: int = PAGE_SIZE_DEFAULT,
+    order: str = "desc",
+    session: Session = Depends(get_session),
+    current_user=None,
+):
+    """
+    Get the readings of a node, newest first by default.
+
+    Parameters:
+    - node_name (str): The name of the node.
+    - start, end (optional): Only return readings created in this window, given as
+      ISO 8601 or YYYYMMDDTHHMMSS. Times without a timezone are in UTC.
+    - limit (optional): The maximum number of readings returned, at most READINGS_PAGE_MAX.
+    - order (optional): asc or desc, sorts the readings by creation time.
+
+    Returns:
+    - dict: The parameters of the node's sensor type and its readings, each with its
+      values ordered as the parameters and its creation time.
+
+    Raises:
+    - HTTPException: If the node is not found or a parameter is invalid.
+    """
+    _, _ = current_user, request
+    if not 1 <= limit <= READINGS_PAGE_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {READINGS_PAGE_MAX}",
+        )
+    if order not in ("asc", "desc"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="order must be asc or desc"
+        )
+
+    node = get_reading_node(node_name, session)
+    query = filter_window(
+        session.query(Reading.ts, Reading.values).filter(Reading.node_id == node.id),
+        start,
+        end,
+    )
+    rows = (
+        query.order_by(Reading.ts.asc() if order == "asc" else Reading.ts.desc())
+        .limit(limit)
+        .all()
+    )
+    return {
+        "node_name": node_name,
+        "parameters": node.parameters,
+        "readings": [{"values": row.values, "ts": row.ts} for row in rows],
+    }
+
+
+@router.get("/{node_name}/aggregate")
+@token_required
+def aggregate_readings(
+    request: Request,
+    node_name: str,
+    param: str,
+    bucket: str = "hour",
+    start: str = None,
+    end: str = None,
+    session: Session = Depends(get_session),
+    current_user=None,
+):
+    """
+    Get the average, minimum, maximum and count of one parameter of a node per time bucket.
+
+    Parameters:
+    - node_name (str): The name of the node.
+    - param (str): The parameter to aggregate, it must hold numbers.
+    - bucket (optional): minute, hour, day, week or month.
+    - start, end (optional): Only aggregate readings created in this window, given as
+      ISO 8601 or YYYYMMDDTHHMMSS. Times without a timezone are in UTC.
+
+    Returns:
+    - dict: One entry per bucket holding readings, oldest first.
+
+    Raises:
+    - HTTPException: If the node is not found or a parameter is invalid.
+    """
+    _, _ = current_user, request
+    if bucket not in BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"bucket must be one of {', '.join(BUCKETS)}",
+        )
+
+    node = get_reading_node(node_name, session)
+    parameters = list(node.parameters or [])
+    if param not in parameters:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown parameter {param}, expected one of {', '.join(parameters)}",
+        )
+
+    # Values are stored ordered as the sensor type parameters
+    element = Reading.values[parameters.index(param)]
+    value = cast(element.astext, Float)
+    period = func.date_trunc(bucket, Reading.ts).label("bucket")
+    query = filter_window(
+        session.query(
+            period,
+            func.avg(value).label("avg"),
+            func.min(value).label("min"),
+            func.max(value).label("max"),
+            func.count().label("count"),
+        ).filter(Reading.node_id == node.id, func.jsonb_typeof(element) == "number"),
+        start,
+        end,
+    )
+    rows = query.group_by(period).order_by(period).all()
+    return {
+        "node_name": node_name,
+        "param": param,
+        "bucket": bucket,
+        "buckets": [
+            {
+                "ts": row.bucket,
+                "avg": row.avg,
+                "min": row.min,
+                "max": row.max,
+                "count": row.count,
+            }
+            for row in rows
+        ],
+    }
@@ -2,10 +2,13 @@ from app.auth.auth import (
     token_required,
     admin_required,
 )
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from app.database import get_session
+from app.utils.pagination import Page, model_fields
 from app.models.sensor_types import SensorTypes as DBSensorType
+from app.utils.node_context import invalidate_sensor_type_contexts
+from app.utils.validators import invalidate_validator
 from app.schemas.sensor_types import (
     SensorTypeCreate,
     SensorTypeDelete,
@@ -56,11 +59,19 @@ def create_sensor_type(
 @admin_required
 def get_sensor_types(
     request: Request,
+    response: Response,
     session: Session = Depends(get_session),
     current_user=None,
 ):
+    """
+    Retrieves the sensor types, one page at a time, see app.utils.pagination.
+    """
+    _ = current_user
+    page = Page(request, response)
     try:
-        sensor_types = session.query(DBSensorType).all()
+        sensor_types = page.fetch(
+            session.query(DBSensorType), DBSensorType.id, model_fields(DBSensorType)
+        )
         if sensor_types is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Sensor types not found"
@@ -69,6 +80,8 @@ def get_sensor_types(
             return {"detail": "No sensor types found"}
         else:
             return sensor_types
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(
@@ -119,6 +132,9 @@ def delete_sensor_type(
             status_code=status.HTTP_404_NOT_FOUND, detail="Sensor type not found"
         )
     else:
+        sensor_type_id = sensor_type.id
         session.delete(sensor_type)
         session.commit()
+        invalidate_sensor_type_contexts(sensor_type_id)
+        invalidate_validator(sensor_type_id)
         raise HTTPException(status_code=200, detail="Sensor type deleted")
@@ -3,7 +3,9 @@ from sqlalchemy.orm import Session
 from app.models.node import Node as DBNode
 from app.models.sensor_types import SensorTypes as DBSensorType
 from app.models.vertical import Vertical as DBVertical
-from app.database import get_session
+from app.database import get_session, get_pool_status
+from app.utils.geocode import get_geocode_cache_stats
+from app.utils.latest_cache import get_latest_cache_stats
 
 router = APIRouter()
 
@@ -33,3 +35,27 @@ def get_major_stats(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error getting stats",
         ) from e
+
+
+@router.get("/pool")
+def get_db_pool_stats():
+    """
+    Get the usage of the database connection pool of this worker
+    """
+    return get_pool_status()
+
+
+@router.get("/geocode")
+def get_geocode_stats():
+    """
+    Get the hit and miss counters of the geocode cache in this worker
+    """
+    return get_geocode_cache_stats()
+
+
+@router.get("/latest")
+def get_latest_stats():
+    """
+    Get the size and hit counters of the latest-value cache in this worker
+    """
+    return get_latest_cache_stats()
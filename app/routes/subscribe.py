@@ -1,4 +1,5 @@
 from fastapi import Depends, APIRouter, Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.models import subscription
 from app.schemas.subscribe import Subscription, SubscriptionDetails
@@ -6,17 +7,22 @@ from app.database import get_session
 from app.auth.auth import (
     token_required,
 )
-from app.utils.om2m_lib import Om2m
+from app.utils.om2m_async import AsyncOm2m
 from app.config.settings import OM2M_URL, MOBIUS_XM2MRI
 
 router = APIRouter()
 
-om2m = Om2m(MOBIUS_XM2MRI, OM2M_URL)
+async_om2m = AsyncOm2m(MOBIUS_XM2MRI, OM2M_URL)
+
+
+def save_subscription(new_subscription, session: Session):
+    session.add(new_subscription)
+    session.commit()
 
 
 @router.post("/subscribe")
 @token_required
-def subscribe_to_node(
+async def subscribe_to_node(
     request: Request,
     subscription_to_node: Subscription,
     session: Session = Depends(get_session),
@@ -38,16 +44,16 @@ def subscribe_to_node(
     _ = request
 
     rn = "sub-" + str(current_user.id)
-    no_of_subscriptions = len(
+    no_of_subscriptions = await run_in_threadpool(
         session.query(subscription.Subscription)
         .filter(
             subscription.Subscription.user_id == current_user.id,
             subscription.Subscription.node_id == subscription_to_node.node_id,
         )
-        .all()
+        .count
     )
     rn += "-" + str(no_of_subscriptions)
-    r = om2m.create_subscription(
+    r = await async_om2m.create_subscription(
         subscription_to_node.node_id + "/Data", rn, subscription_to_node.url
     )
     # return the message from response
@@ -63,8 +69,7 @@ def subscribe_to_node(
             node_id=subscription_to_node.node_id,
             status="active",
         )
-        session.add(new_subscription)
-        session.commit()
+        await run_in_threadpool(save_subscription, new_subscription, session)
         return {"message": "Subscribed to node"}
 
 
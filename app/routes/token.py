@@ -2,14 +2,22 @@
 This module defines the user routes for creating and mapping tokens.
 """
 
+import datetime
+import math
+
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 
+from sqlalchemy import false, func, insert, literal, select, true
 from sqlalchemy.orm import Session
 
 from app.models.sensor_types import SensorTypes as DBSensorTypes
 from app.models.token import Token as DBToken
 from app.models.node import Node as DBNode
 from app.database import get_session
+from app.utils.node_context import invalidate_node_context
+from app.utils.sequences import reserve_statement
+from app.utils.geocode import KM_PER_DEGREE, haversine_km
+from app.config.settings import TOKEN_BATCH_MAX_SIZE, DEPLOY_TOKEN_TOLERANCE_M
 from app.auth.auth import (
     token_required,
 )
@@ -18,6 +26,54 @@ from app.auth.auth import (
 router = APIRouter()
 
 
+def issue_tokens(sensor_type_name: str, count: int, user_id: int, session: Session) -> list:
+    """
+    Issues count consecutive tokens of a sensor type to a user.
+
+    The token numbers are reserved and the tokens inserted by one statement, so
+    concurrent callers never collide on (sensor_type, token_id).
+
+    Raises:
+        HTTPException: If the sensor type is not found.
+
+    Returns:
+        list: The issued token numbers.
+    """
+    res = session.query(DBSensorTypes.id).filter(
+        DBSensorTypes.res_name == sensor_type_name).first()
+
+    if res is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Sensor type not found")
+
+    tokens = DBToken.__table__
+    # Seeds the counter from the tokens issued before it existed
+    seed = (
+        select(func.max(tokens.c.token_id))
+        .where(tokens.c.sensor_type == res.id)
+        .scalar_subquery()
+    )
+    counter = reserve_statement(f"token_id:{res.id}", count, seed=seed).cte("counter")
+    offsets = func.generate_series(1, count).table_valued("n")
+    statement = (
+        insert(tokens)
+        .from_select(
+            ["sensor_type", "token_id", "assigned_to", "status", "issue_time"],
+            select(
+                literal(res.id),
+                counter.c.value - count + offsets.c.n,
+                literal(user_id),
+                false(),
+                literal(datetime.datetime.now()),
+            ).select_from(counter.join(offsets, true())),
+        )
+        .returning(tokens.c.token_id)
+    )
+    issued = sorted(row.token_id for row in session.execute(statement))
+    session.commit()
+    return issued
+
+
 @router.get("/get-token")
 @token_required
 def get_token(request: Request, session: Session = Depends(get_session), current_user=None):
@@ -34,29 +90,79 @@ def get_token(request: Request, session: Session = Depends(get_session), current
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Sensor type not specified")
 
-    res = session.query(DBSensorTypes).filter(
-        DBSensorTypes.res_name == sensor_type).first()
+    token = issue_tokens(sensor_type, 1, current_user.id, session)[0]
 
-    if res is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail="Sensor type not found")
+    return {"token": token}
 
-    token_num = session.query(DBToken.token_id).filter(
-        DBToken.sensor_type == res.id).order_by(DBToken.token_id.desc()).first()
-    token = token_num[0] + 1 if token_num else 1
 
-    user_id = current_user.id
+@router.get("/get-tokens")
+@token_required
+def get_tokens(request: Request, session: Session = Depends(get_session), current_user=None):
+    """
+    Get count new consecutive token numbers for the specific sensor type
 
-    db_token = DBToken(
-        sensor_type=res.id,
-        token_id=token,
-        assigned_to=user_id
-    )
-    session.add(db_token)
-    session.commit()
-    session.refresh(db_token)
+    request URL: /get-tokens?sensor_type=Kristnam&count=100
 
-    return {"token": token}
+    """
+
+    sensor_type = request.query_params.get("sensor_type")
+    count = request.query_params.get("count")
+
+    if sensor_type is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Sensor type not specified")
+    if count is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Count not specified")
+    try:
+        count = int(count)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Count must be an integer") from None
+    if count < 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Count must be at least 1")
+    if count > TOKEN_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Request at most {TOKEN_BATCH_MAX_SIZE} tokens at one time")
+
+    tokens = issue_tokens(sensor_type, count, current_user.id, session)
+
+    return {"tokens": tokens}
+
+
+def find_deploy_node(sensor_type_id: int, lat: float, long: float, tolerance_m: float, session: Session):
+    """
+    Returns the node of a sensor type nearest to the given coordinates, within tolerance_m metres.
+
+    Candidates are read with a bounding box on (sensor_type_id, lat, long), which the
+    ix_nodes_sensor_type_id_lat_long index serves, then ranked by great-circle distance.
+    Unmapped nodes are preferred over nodes already mapped to a token.
+
+    Returns:
+        Node: The nearest unmapped node, else the nearest mapped one, else None.
+    """
+    dlat = tolerance_m / 1000 / KM_PER_DEGREE
+    # Degrees of longitude shrink with the cosine of the latitude
+    dlong = min(dlat / max(math.cos(math.radians(lat)), 1e-6), 180)
+    candidates = (
+        session.query(DBNode)
+        .filter(
+            DBNode.sensor_type_id == sensor_type_id,
+            DBNode.lat.between(lat - dlat, lat + dlat),
+            DBNode.long.between(long - dlong, long + dlong),
+        )
+        .all()
+    )
+    best, best_key = None, None
+    for node in candidates:
+        distance = haversine_km(lat, long, node.lat, node.long) * 1000
+        if distance > tolerance_m:
+            continue
+        key = (node.token_num is not None, distance, node.id)
+        if best_key is None or key < best_key:
+            best, best_key = node, key
+    return best
 
 
 @router.get("/deploy-token")
@@ -67,6 +173,10 @@ def deploy_token(request: Request, session: Session = Depends(get_session), curr
 
     request URL: /deploy-token?sensor_type=Kristnam&token=1&lat=12.345&long=67.890
 
+    The token is mapped to the nearest unmapped node of the sensor type within tolerance
+    metres of the given coordinates, DEPLOY_TOKEN_TOLERANCE_M by default. Pass
+    tolerance=0 to require the exact coordinates.
+
     """
 
     _ = current_user
@@ -75,6 +185,7 @@ def deploy_token(request: Request, session: Session = Depends(get_session), curr
     token = request.query_params.get("token")
     lat = request.query_params.get("lat")
     long = request.query_params.get("long")
+    tolerance = request.query_params.get("tolerance", DEPLOY_TOKEN_TOLERANCE_M)
 
     if sensor_type is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
@@ -88,6 +199,14 @@ def deploy_token(request: Request, session: Session = Depends(get_session), curr
     if long is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Longitude not specified")
+    try:
+        lat, long, tolerance = float(lat), float(long), float(tolerance)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Latitude, longitude and tolerance must be numbers") from None
+    if tolerance < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Tolerance must not be negative")
 
     res = session.query(DBSensorTypes).filter(
         DBSensorTypes.res_name == sensor_type).first()
@@ -101,8 +220,7 @@ def deploy_token(request: Request, session: Session = Depends(get_session), curr
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Invalid token")
 
-    node = session.query(DBNode).filter(
-        DBNode.sensor_type_id == res.id, DBNode.lat == lat, DBNode.long == long).first()
+    node = find_deploy_node(res.id, lat, long, tolerance, session)
     if node is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="No such node exists")
@@ -114,6 +232,7 @@ def deploy_token(request: Request, session: Session = Depends(get_session), curr
     token_num.status = True
     node.token_num = token
     session.commit()
+    invalidate_node_context(token)
     session.refresh(token_num)
     session.refresh(node)
 
@@ -2,15 +2,16 @@
 This module defines the user routes for the FastAPI application.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 
 from sqlalchemy.orm import Session
 
 from app.schemas.user import UserCreate, RequestDetails, ChangePassword
 from app.schemas.token import TokenSchema, TokenRefresh
 from app.models.user import User
-from app.models.token_table import TokenTable
+from app.models.token_table import TokenTable, token_digest
 from app.database import get_session
+from app.utils.pagination import Page, model_fields
 from app.auth.auth import (
     decode_refresh_jwt,
     create_access_token,
@@ -19,6 +20,7 @@ from app.auth.auth import (
     get_hashed_password,
     token_required,
     admin_required,
+    revoke_cached_token,
 )
 
 router = APIRouter()
@@ -170,7 +172,7 @@ def refresh_token(token: TokenRefresh, db: Session = Depends(get_session)):
             db.query(TokenTable)
             .filter(
                 TokenTable.user_id == user_id,
-                TokenTable.refresh_token == token.refresh_token,
+                TokenTable.refresh_token_hash == token_digest(token.refresh_token),
                 TokenTable.status == True,
             )
             .first()
@@ -183,8 +185,10 @@ def refresh_token(token: TokenRefresh, db: Session = Depends(get_session)):
         access_token = create_access_token(user.id)
 
         # Update the TokenTable with the new access token
+        old_access_token = refresh_token_data.access_token
         refresh_token_data.access_token = access_token
         db.commit()
+        revoke_cached_token(old_access_token)
 
         return {
             "access_token": access_token,
@@ -198,24 +202,54 @@ def refresh_token(token: TokenRefresh, db: Session = Depends(get_session)):
         raise HTTPException(status_code=400, detail="Invalid refresh token.") from e
 
 
+@router.post("/logout")
+@token_required
+def logout(
+    request: Request, session: Session = Depends(get_session), current_user=None
+):
+    """
+    Revokes the access token used for this request.
+
+    Args:
+        session (Session, optional): The database session. Defaults to Depends(get_session()).
+
+    Returns:
+        dict: A dictionary containing a success message.
+    """
+    _, _, access_token = request.headers.get("Authorization").partition(" ")
+    session.query(TokenTable).filter(
+        TokenTable.user_id == current_user.id,
+        TokenTable.access_token_hash == token_digest(access_token),
+    ).update({TokenTable.status: False})
+    session.commit()
+    revoke_cached_token(access_token)
+
+    return {"message": "Logged out successfully"}
+
+
 @router.get("/getusers")
 @token_required
 def getusers(
-    request: Request, session: Session = Depends(get_session), current_user=None
+    request: Request,
+    response: Response,
+    session: Session = Depends(get_session),
+    current_user=None,
 ):
     """
-    Returns a list of all users.
+    Returns a page of users, see app.utils.pagination.
 
     Args:
         session (Session, optional): The database session. Defaults to Depends(get_session()).
 
     Returns:
-        list: A list of all users.
+        list: The users of the page.
     """
     # use request to avoid pycharm warning
-    _ = request, current_user
-    user = session.query(User).all()
-    return user
+    _ = current_user
+    fields = model_fields(User, exclude=("password",))
+    return Page(request, response).fetch(
+        session.query(User), User.id, fields, default=list(fields)
+    )
 
 
 @router.get("/am-i-admin")
@@ -260,7 +294,7 @@ def change_password(
     Returns:
         dict: A dictionary containing a success message.
     """
-    _, _ = request, current_user
+    _ = current_user
     user = session.query(User).filter(User.email == password_request.email).first()
     if user is None:
         raise HTTPException(
@@ -285,7 +319,23 @@ def change_password(
 
     encrypted_password = get_hashed_password(password_request.new_password)
     user.password = encrypted_password
+
+    # Sign out every other session of the user, they were opened with the old password
+    _, _, access_token = request.headers.get("Authorization").partition(" ")
+    sessions = (
+        session.query(TokenTable)
+        .filter(
+            TokenTable.user_id == user.id,
+            TokenTable.status == True,
+            TokenTable.access_token_hash != token_digest(access_token),
+        )
+        .all()
+    )
+    for token in sessions:
+        token.status = False
     session.commit()
+    for token in sessions:
+        revoke_cached_token(token.access_token)
 
     # TODO: Add to db, last password changed
     return {"message": "Password changed successfully"}
@@ -1,7 +1,8 @@
 import xml.etree.ElementTree as ET
 import json
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.auth.auth import (
     token_required,
@@ -9,23 +10,25 @@ from app.auth.auth import (
 )
 
 from app.database import get_session
+from app.utils.pagination import Page, model_fields
 from app.config.settings import OM2M_URL, MOBIUS_XM2MRI
-from app.utils.om2m_lib import Om2m
+from app.utils.om2m_async import AsyncOm2m
 from app.schemas.verticals import VerticalCreate
 from app.models.vertical import Vertical as DBAE
 from app.models.node import Node as DBNode
 from app.models.sensor_types import SensorTypes as DBSensorTypes
-from app.utils.create import create_vertical
+from app.utils.create import create_vertical_async
+from app.utils.node_context import invalidate_sensor_type_contexts
 
 router = APIRouter()
 
-om2m = Om2m(MOBIUS_XM2MRI, OM2M_URL)
+async_om2m = AsyncOm2m(MOBIUS_XM2MRI, OM2M_URL)
 
 
 @router.post("/create-ae")
 @token_required
 @admin_required
-def create_ae(
+async def create_ae(
     vertical: VerticalCreate,
     request: Request,
     session: Session = Depends(get_session),
@@ -50,7 +53,7 @@ def create_ae(
     if len(vertical.labels) == 0:
         vertical.labels = [vertical.ae_name]
 
-    status_code = create_vertical(
+    status_code = await create_vertical_async(
         vertical.ae_name,
         vertical.ae_short_name,
         vertical.ae_description,
@@ -73,38 +76,25 @@ def create_ae(
 @token_required
 def get_all(
     request: Request,
+    response: Response,
     current_user=None,
     session: Session = Depends(get_session),
 ):
     """
-    Retrieves all the verticals in the database.
+    Retrieves the verticals in the database, one page at a time, see app.utils.pagination.
     """
-    _, _ = current_user, request
-    verticals = session.query(DBAE).all()
-    return verticals
+    _ = current_user
+    return Page(request, response).fetch(session.query(DBAE), DBAE.id, model_fields(DBAE))
 
 
-@router.delete("/delete-ae/{vert_id}")
-@token_required
-@admin_required
-def delete_ae(
-    request: Request,
-    vert_id: int,
-    session: Session = Depends(get_session),
-    current_user=None,
-):
+def get_deletable_ae(vert_id: int, session: Session):
     """
-    This function deletes an AE resource in OM2M.
-
-    Args:
-        vertical (VerticalDelete): The vertical object containing the AE name to be deleted.
-        request (Request): The HTTP request object.
-        session (Session, optional): The database session. Defaults to Depends(get_session).
+    Returns the AE of a vertical that has no nodes, and deletes its sensor types in the
+    session. Nothing is committed.
 
-    Returns:
-        int: The status code of the request.
+    Raises:
+        HTTPException: If the AE is not found or still has nodes.
     """
-    _, _ = current_user, request
     ae = session.query(DBAE).filter(DBAE.id == vert_id).first()
     print(ae)
     if ae is None:
@@ -136,13 +126,44 @@ def delete_ae(
         # Delete sensor types
         for st in sensor_types:
             session.delete(st)
+    return ae, [st.id for st in sensor_types]
+
+
+def commit_ae_deletion(ae, session: Session):
+    session.delete(ae)
+    session.commit()
+
+
+@router.delete("/delete-ae/{vert_id}")
+@token_required
+@admin_required
+async def delete_ae(
+    request: Request,
+    vert_id: int,
+    session: Session = Depends(get_session),
+    current_user=None,
+):
+    """
+    This function deletes an AE resource in OM2M.
+
+    Args:
+        vertical (VerticalDelete): The vertical object containing the AE name to be deleted.
+        request (Request): The HTTP request object.
+        session (Session, optional): The database session. Defaults to Depends(get_session).
+
+    Returns:
+        int: The status code of the request.
+    """
+    _, _ = current_user, request
+    ae, sensor_type_ids = await run_in_threadpool(get_deletable_ae, vert_id, session)
 
     final_path = f"{ae.res_short_name}"
-    status_code = om2m.delete_resource(final_path).status_code
+    status_code = (await async_om2m.delete_resource(final_path)).status_code
     print(status_code)
     if status_code >= 200 and status_code < 300:
-        session.delete(ae)
-        session.commit()
+        await run_in_threadpool(commit_ae_deletion, ae, session)
+        for sensor_type_id in sensor_type_ids:
+            invalidate_sensor_type_contexts(sensor_type_id)
         raise HTTPException(status_code=204, detail="AE deleted")
     elif status_code == 404:
         raise HTTPException(
@@ -37,3 +37,18 @@ class ContentInstanceDelete(BaseModel):
     path: str
     cin_id: str
     node_id: str
+
+
+class ContentInstanceResult(BaseModel):
+    """
+    Represents the outcome of a single reading in a batched create request.
+
+    Attributes:
+        index (int): Position of the reading in the submitted batch.
+        status_code (int): The HTTP status code for this reading.
+        detail (str): A short description of the outcome.
+    """
+
+    index: int
+    status_code: int
+    detail: str
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -21,3 +23,15 @@ class NodeAssign(BaseModel):
 
     node_id: str
     vendor_email: str
+
+
+class NodesLatest(BaseModel):
+    """
+    Pydantic model for selecting the nodes whose latest readings are requested.
+
+    Either node_names, or a vertical and/or area filter.
+    """
+
+    node_names: Optional[list[str]] = None
+    vertical: Optional[str] = None
+    area: Optional[str] = None
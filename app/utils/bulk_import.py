@@ -0,0 +1,405 @@
+"""
+This module provides the concurrent pipeline used to import many nodes at once.
+
+A batch is processed in stages instead of node by node:
+1. resolve sensor types, verticals and existing node names with one query each,
+2. geocode every distinct (quantized) coordinate once,
+3. reserve a block of node numbers per sensor type, the numbers of failed items stay gaps,
+4. create the Mobius containers with bounded concurrency,
+5. insert the created nodes with one bulk INSERT,
+6. write the Descriptor content instance of every inserted node.
+"""
+
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.models.node import Node as DBNode
+from app.models.sensor_types import SensorTypes as DBSensorType
+from app.models.vertical import Vertical as DBVertical
+from app.utils.geocode import quantize
+from app.utils.om2m_async import AsyncOm2m
+from app.utils.utils import get_pincode, format_node_code, reserve_sensor_node_numbers
+from app.config.settings import OM2M_URL, MOBIUS_XM2MRI, IMPORT_CONCURRENCY
+
+async_om2m = AsyncOm2m(MOBIUS_XM2MRI, OM2M_URL)
+
+INSERT_CHUNK_SIZE = 1000
+
+FIELD_LENGTHS = {
+    "name": DBNode.name.type.length,
+    "area": min(DBNode.area.type.length, DBNode.location.type.length),
+}
+"""Longest value of the node fields stored in bounded columns, checked before any container is created"""
+
+
+class ImportItem:
+    """
+    The state of one node while it moves through the pipeline.
+    """
+
+    __slots__ = (
+        "index",
+        "node",
+        "sensor_type",
+        "latitude",
+        "longitude",
+        "pincode",
+        "sensor_node_number",
+        "res_id",
+        "orid",
+        "node_data_orid",
+        "error",
+        "invalid",
+        "inserted",
+    )
+
+    def __init__(self, index: int, node: dict):
+        self.index = index
+        self.node = node
+        self.sensor_type = None
+        self.latitude = None
+        self.longitude = None
+        self.pincode = None
+        self.sensor_node_number = None
+        self.res_id = None
+        self.orid = None
+        self.node_data_orid = None
+        self.error = None
+        """Message of the failure, None while the node is still being processed"""
+        self.invalid = False
+        """The failure is an unknown sensor type"""
+        self.inserted = False
+
+    @property
+    def pending(self) -> bool:
+        return self.error is None
+
+    def fail(self, message: str, invalid: bool = False):
+        self.error = message
+        self.invalid = invalid
+
+
+class SensorTypeInfo:
+    """
+    The sensor type details shared by the nodes of an import.
+    """
+
+    __slots__ = ("id", "res_name", "parameters", "vertical_name")
+
+    def __init__(self, row):
+        self.id = row.id
+        self.res_name = row.res_name
+        self.parameters = row.parameters
+        self.vertical_name = row.res_short_name
+
+
+def resolve(items: list, session: Session):
+    """
+    Checks sensor types, verticals, names and coordinates of every item.
+    """
+    rows = (
+        session.query(
+            DBSensorType.id,
+            DBSensorType.res_name,
+            DBSensorType.parameters,
+            DBVertical.res_short_name,
+        )
+        .outerjoin(DBVertical, DBVertical.id == DBSensorType.vertical_id)
+        .all()
+    )
+    sensor_types = {row.res_name: SensorTypeInfo(row) for row in rows}
+
+    names = {item.node.get("name") for item in items}
+    existing = {
+        name
+        for (name,) in session.query(DBNode.name).filter(DBNode.name.in_(names)).all()
+    }
+
+    for item in items:
+        node = item.node
+        sensor_name = node["sensor_type"]
+        sensor_type = sensor_types.get(sensor_name)
+        if sensor_type is None:
+            item.fail(f"Sensor type '{sensor_name}' not found", invalid=True)
+            continue
+        node["sensor_type_id"] = sensor_type.id
+        item.sensor_type = sensor_type
+
+        try:
+            item.latitude = float(node["latitude"])
+            item.longitude = float(node["longitude"])
+            name = node["name"]
+            _ = node["area"]
+        except (KeyError, TypeError, ValueError) as e:
+            item.fail(str(e))
+            continue
+
+        too_long = next(
+            (field for field, limit in FIELD_LENGTHS.items() if len(str(node[field])) > limit),
+            None,
+        )
+        if too_long is not None:
+            item.fail(f"{too_long} must be at most {FIELD_LENGTHS[too_long]} characters")
+            continue
+
+        if name in existing:
+            item.fail(f"Node: {name} already exists")
+            continue
+        # A name repeated inside the batch belongs to its first occurrence
+        existing.add(name)
+
+        if sensor_type.vertical_name is None:
+            item.fail("Non Existing Domain, please check the sensor type")
+
+
+def geocode(items: list):
+    """
+    Resolves the pincode of every item, looking each distinct quantized coordinate up once.
+    """
+    pincodes = {}
+    for item in items:
+        if not item.pending:
+            continue
+        key = quantize(item.latitude, item.longitude)
+        if key not in pincodes:
+            try:
+                pincodes[key] = (get_pincode(item.latitude, item.longitude), None)
+            except Exception as e:
+                pincodes[key] = (None, str(e))
+        item.pincode, error = pincodes[key]
+        if error is not None:
+            item.fail(error)
+
+
+def number(items: list):
+    """
+    Assigns sensor node numbers and node codes, reserving one block per sensor type.
+    """
+    by_sensor_type = {}
+    for item in items:
+        if item.pending:
+            by_sensor_type.setdefault(item.sensor_type.id, []).append(item)
+    for sensor_type_id, group in by_sensor_type.items():
+        first = reserve_sensor_node_numbers(sensor_type_id, len(group))
+        for offset, item in enumerate(group):
+            sensor_type = item.sensor_type
+            item.sensor_node_number = first + offset
+            item.res_id = format_node_code(
+                sensor_type.vertical_name, sensor_type.id, item.pincode, item.sensor_node_number
+            )
+
+
+def orid_of(response) -> str:
+    """Returns the resource ID of a container from its creation response"""
+    return response.json()["m2m:cnt"]["ri"].split("/")[-1]
+
+
+async def create_containers(item: ImportItem, semaphore: asyncio.Semaphore):
+    """
+    Creates the node, Data and Descriptor containers of an item in Mobius.
+    """
+    vert_name = item.sensor_type.vertical_name
+    res_id = item.res_id
+    async with semaphore:
+        try:
+            response = await async_om2m.create_container(
+                res_id, vert_name, labels=[vert_name, res_id]
+            )
+            if response.status_code == 409:
+                item.fail("Node already exists")
+                return
+            if response.status_code != 201:
+                item.fail("Error creating node")
+                return
+            res_data, res_desc = await asyncio.gather(
+                async_om2m.create_container(
+                    "Data", f"{vert_name}/{res_id}", labels=["Data", res_id]
+                ),
+                async_om2m.create_container(
+                    "Descriptor", f"{vert_name}/{res_id}", labels=["Descriptor", res_id]
+                ),
+            )
+            if res_data.status_code != 201 or res_desc.status_code != 201:
+                item.fail("Error creating node")
+                return
+            item.orid = orid_of(response)
+            item.node_data_orid = orid_of(res_data)
+        except Exception as e:
+            item.fail(str(e))
+
+
+async def create_descriptor(item: ImportItem, semaphore: asyncio.Semaphore):
+    """
+    Stores the sensor type parameters in the Descriptor container of an item.
+    """
+    vert_name = item.sensor_type.vertical_name
+    async with semaphore:
+        try:
+            response = await async_om2m.create_cin(
+                f"{vert_name}/{item.res_id}",
+                "Descriptor",
+                con=str(item.sensor_type.parameters),
+                lbl=[item.sensor_type.res_name],
+            )
+            if response.status_code != 201:
+                item.fail("Error creating node")
+        except Exception as e:
+            item.fail(str(e))
+
+
+def node_row(item: ImportItem) -> dict:
+    """Returns the nodes row of an item whose containers were created"""
+    return {
+        "labels": [item.sensor_type.vertical_name, item.res_id],
+        "sensor_type_id": item.sensor_type.id,
+        "sensor_node_number": item.sensor_node_number,
+        "lat": item.latitude,
+        "long": item.longitude,
+        "location": item.node["area"],
+        "area": item.node["area"],
+        "orid": item.orid,
+        "node_name": item.res_id,
+        "node_data_orid": item.node_data_orid,
+        "token_num": None,
+        "name": item.node["name"],
+    }
+
+
+def insert_rows(items: list, session: Session, on_insert=None):
+    """
+    Inserts the nodes rows of items and sets their token_num to the generated id, as
+    create_node does. on_insert(items, session) runs in the same transaction.
+    """
+    table = DBNode.__table__
+    rows = [node_row(item) for item in items]
+    ids = [row.id for row in session.execute(insert(table).values(rows).returning(table.c.id))]
+    session.execute(update(table).where(table.c.id.in_(ids)).values(token_num=table.c.id))
+    if on_insert is not None:
+        on_insert(items, session)
+    session.commit()
+
+
+def insert_nodes(items: list, session: Session, on_insert=None):
+    """
+    Inserts the nodes whose containers were created, with one INSERT per chunk of rows.
+
+    When a chunk is rejected, its rows are inserted one by one so only the offending
+    nodes fail.
+
+    Args:
+        on_insert (callable): Called with the inserted items and the session before the
+            insert is committed, to record them in the same transaction.
+    """
+    created = [item for item in items if item.pending]
+    for start in range(0, len(created), INSERT_CHUNK_SIZE):
+        chunk = created[start : start + INSERT_CHUNK_SIZE]
+        try:
+            insert_rows(chunk, session, on_insert)
+        except SQLAlchemyError as e:
+            session.rollback()
+            print(f"Error inserting {len(chunk)} nodes, retrying one by one: {e}")
+        else:
+            for item in chunk:
+                item.inserted = True
+            continue
+        for item in chunk:
+            try:
+                insert_rows([item], session, on_insert)
+            except SQLAlchemyError as e:
+                session.rollback()
+                item.fail(f"Error saving node: {getattr(e, 'orig', None) or e}")
+            else:
+                item.inserted = True
+
+
+def load_inserted(items: list, session: Session):
+    """
+    Fills in the sensor type and node code of items whose nodes were inserted by an
+    earlier, interrupted run, so their descriptors can be written.
+    """
+    rows = (
+        session.query(
+            DBNode.name,
+            DBNode.node_name,
+            DBSensorType.id,
+            DBSensorType.res_name,
+            DBSensorType.parameters,
+            DBVertical.res_short_name,
+        )
+        .join(DBSensorType, DBSensorType.id == DBNode.sensor_type_id)
+        .join(DBVertical, DBVertical.id == DBSensorType.vertical_id)
+        .filter(DBNode.name.in_([item.node.get("name") for item in items]))
+        .all()
+    )
+    nodes = {row.name: row for row in rows}
+    for item in items:
+        row = nodes.get(item.node.get("name"))
+        if row is None:
+            item.fail("Node not found")
+            continue
+        item.sensor_type = SensorTypeInfo(row)
+        item.res_id = row.node_name
+        item.inserted = True
+
+
+async def complete_nodes(
+    nodes: list, session: Session, concurrency: int = IMPORT_CONCURRENCY
+) -> list:
+    """
+    Writes the Descriptor content instance of nodes already inserted in the database.
+
+    Returns:
+        list: One ImportItem per node, in the order they were given.
+    """
+    items = [ImportItem(idx, node) for idx, node in enumerate(nodes)]
+    await run_in_threadpool(load_inserted, items, session)
+    semaphore = asyncio.Semaphore(concurrency)
+    await asyncio.gather(
+        *(create_descriptor(item, semaphore) for item in items if item.inserted)
+    )
+    return items
+
+
+async def import_nodes(
+    nodes: list,
+    session: Session,
+    concurrency: int = IMPORT_CONCURRENCY,
+    before_insert=None,
+    on_insert=None,
+) -> list:
+    """
+    Creates the given nodes in Mobius and the database.
+
+    Args:
+        nodes (list): Node dicts with sensor_type, latitude, longitude, area and name.
+        session (Session): The database session.
+        concurrency (int): How many Mobius requests may be in flight at once.
+        before_insert (callable): Called in a worker thread right before the nodes are
+            inserted, it may raise to abandon the batch.
+        on_insert (callable): See insert_nodes.
+
+    Returns:
+        list: One ImportItem per node, in the order they were given.
+    """
+    items = [ImportItem(idx, node) for idx, node in enumerate(nodes)]
+
+    await run_in_threadpool(resolve, items, session)
+    await run_in_threadpool(geocode, items)
+    await run_in_threadpool(number, items)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    await asyncio.gather(
+        *(create_containers(item, semaphore) for item in items if item.pending)
+    )
+    if before_insert is not None:
+        await run_in_threadpool(before_insert)
+    await run_in_threadpool(insert_nodes, items, session, on_insert)
+    await asyncio.gather(
+        *(create_descriptor(item, semaphore) for item in items if item.inserted)
+    )
+    return items
+
@@ -0,0 +1,78 @@
+"""
+This module encodes the readings stored in content instances and decodes them back.
+
+Readings are stored as a JSON array of the sensor type parameter values, in parameter
+order, e.g. [21.5,true,"ok"], so values keep their type. Content instances written
+before are Python list reprs of strings, e.g. ['21.5', 'True', 'ok'], and are still
+decoded, with ast.literal_eval.
+"""
+
+import ast
+import json
+
+
+def encode(values: list) -> str:
+    """Returns the content of a content instance holding the given values"""
+    return json.dumps(values, separators=(",", ":"))
+
+
+def decode(con: str) -> list:
+    """
+    Returns the values held by the content of a content instance.
+
+    Raises:
+        ValueError: If the content is neither a JSON array nor the repr of a Python list.
+    """
+    try:
+        values = json.loads(con)
+    except TypeError as e:
+        raise ValueError(f"Cannot decode content {con!r}") from e
+    except ValueError:
+        try:
+            values = ast.literal_eval(con)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError) as e:
+            raise ValueError(f"Cannot decode content {con!r}") from e
+    # Readings are arrays, anything else (e.g. "5", an object, "1,2" as a tuple) is not one
+    if not isinstance(values, list):
+        raise ValueError(f"Cannot decode content {con!r}")
+    return values
+
+
+def decode_or_none(con: str):
+    """Returns the values held by the content of a content instance, None if it cannot be decoded"""
+    try:
+        return decode(con)
+    except ValueError:
+        return None
+
+
+def decode_many(cons: list, lenient: bool = False) -> list:
+    """
+    Returns the values held by each of the given contents.
+
+    When every content is a JSON array they are decoded with one json.loads over a single
+    joined array; otherwise each content is decoded on its own.
+
+    Args:
+        cons (list): The contents.
+        lenient (bool): Return None for the contents that cannot be decoded instead of raising.
+
+    Raises:
+        ValueError: If a content cannot be decoded and lenient is False.
+    """
+    if not cons:
+        return []
+    try:
+        values = json.loads("[" + ",".join(cons) + "]")
+    except (TypeError, ValueError):
+        values = None
+    # A content split across elements (e.g. "[1" and "2]") or holding several values
+    # shifts the others, and a content that is not an array is not a reading; the joined
+    # array can only be trusted if it has one array per content
+    if (
+        values is None
+        or len(values) != len(cons)
+        or not all(isinstance(value, list) for value in values)
+    ):
+        values = [(decode_or_none if lenient else decode)(con) for con in cons]
+    return values
@@ -3,16 +3,19 @@ This module provides a class to create various entities like vertical, sensor ty
 """
 
 from fastapi import Depends, Request, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import json
 
 from app.schemas.import_conf import Vertical, SensorType, Area
 from app.utils.om2m_lib import Om2m
+from app.utils.om2m_async import AsyncOm2m
 from app.utils.utils import (
     get_vertical_name,
     gen_vertical_code,
     get_sensor_type_id,
-    get_next_sensor_node_number,
+    release_sensor_node_numbers,
+    reserve_sensor_node_numbers,
     get_node_code,
     get_sensor_type_name
 )
@@ -25,6 +28,24 @@ from app.schemas.nodes import NodeCreate
 from app.database import get_session
 
 om2m = Om2m(MOBIUS_XM2MRI, OM2M_URL)
+async_om2m = AsyncOm2m(MOBIUS_XM2MRI, OM2M_URL)
+
+
+def save_vertical(vert_name, vert_short_name, vert_description, labels, res_id, db: Session):
+    """Stores a vertical whose AE exists in Mobius, returns 409 if it is already stored"""
+    res = db.query(DBAE).filter(DBAE.res_name == vert_name).first()
+    if res is not None:
+        return 409
+    db_vertical = DBAE(
+        res_name=vert_name,
+        res_short_name=vert_short_name,
+        labels=labels,
+        orid=res_id,
+        description=vert_description,
+    )
+    db.add(db_vertical)
+    db.commit()
+    return 201
 
 
 def create_vertical(vert_name, vert_short_name, vert_description, labels, db: Session):
@@ -39,26 +60,36 @@ def create_vertical(vert_name, vert_short_name, vert_description, labels, db: Se
         data = data.text
     if status_code == 201 or status_code == 409:
         res_id = json.loads(data)["m2m:ae"]["ri"].split("/")[-1]
-
-        # check if vertical already exists
-        res = db.query(DBAE).filter(DBAE.res_name == vert_name).first()
-        if res is not None:
-            return 409
-
-        db_vertical = DBAE(
-            res_name=vert_name,
-            res_short_name=vert_short_name,
-            labels=labels,
-            orid=res_id,
-            description=vert_description,
-        )
-        db.add(db_vertical)
-        db.commit()
-        return 201
+        return save_vertical(vert_name, vert_short_name, vert_description, labels, res_id, db)
     else:
         return status_code
 
 
+async def create_vertical_async(
+    vert_name, vert_short_name, vert_description, labels, db: Session
+):
+    """
+    Same as create_vertical, for the async routes: Mobius is called through the pooled
+    async client and the database in the threadpool.
+    """
+    vert_short_name = "AE-" + vert_short_name
+    # check if vertical already exists
+    res = await run_in_threadpool(
+        db.query(DBAE).filter(DBAE.res_name == vert_name).first
+    )
+    if res is not None:
+        return 409
+    status_code, data = await async_om2m.create_ae(vert_short_name, labels=labels)
+    if status_code == 409:
+        data = (await async_om2m.get_containers(vert_short_name)).text
+    if status_code == 201 or status_code == 409:
+        res_id = json.loads(data)["m2m:ae"]["ri"].split("/")[-1]
+        return await run_in_threadpool(
+            save_vertical, vert_name, vert_short_name, vert_description, labels, res_id, db
+        )
+    return status_code
+
+
 def insert_vertical(vertical: Vertical, db: Session):
     """
     Create a vertical in the database.
@@ -152,12 +183,14 @@ def insert_all_node(area: Area, db: Session):
                 print("vertical not found")
                 return False  # TODO: Raise error
 
+            sensor_node_number = reserve_sensor_node_numbers(sensor_type_id)
             res_id = get_node_code(
                 vert_name,
                 sensor_type_id,
                 sensor.coordinates.latitude,
                 sensor.coordinates.longitude,
                 db,
+                sensor_node_number=sensor_node_number,
             )
             print(res_id)
 
@@ -191,7 +224,7 @@ def insert_all_node(area: Area, db: Session):
                 long=sensor.coordinates.longitude,
                 location=loc.name,
                 area=area.area,
-                sensor_node_number=get_next_sensor_node_number(sensor_type_id, db),
+                sensor_node_number=sensor_node_number,
                 orid=res_id,
             )
 
@@ -237,8 +270,14 @@ def create_node(
             return {"status": "error", "message": "Non Existing Domain, please check the sensor type"}
 
         print(vert_name, node.sensor_type_id, node.latitude, node.longitude)
+        sensor_node_number = reserve_sensor_node_numbers(node.sensor_type_id)
         res_id = get_node_code(
-            vert_name, node.sensor_type_id, node.latitude, node.longitude, session
+            vert_name,
+            node.sensor_type_id,
+            node.latitude,
+            node.longitude,
+            session,
+            sensor_node_number=sensor_node_number,
         )
 
         response = om2m.create_container(res_id, f"{vert_name}", labels=[vert_name, res_id])
@@ -256,9 +295,7 @@ def create_node(
             new_node = DBNode(
                 labels=[vert_name, res_id],
                 sensor_type_id=node.sensor_type_id,
-                sensor_node_number=get_next_sensor_node_number(
-                    node.sensor_type_id, session
-                ),
+                sensor_node_number=sensor_node_number,
                 lat=node.latitude,
                 long=node.longitude,
                 location=node.area,
@@ -304,6 +341,8 @@ def create_node(
             return {"status": "error", "message": "Node already exists"}
         else:
             print(response.status_code)
+            # The container was not created, its number can be handed back
+            release_sensor_node_numbers(node.sensor_type_id, sensor_node_number)
             return {"status": "error", "message": "Error creating node"}
 
     except Exception as e:
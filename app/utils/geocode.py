@@ -0,0 +1,265 @@
+"""
+This module resolves coordinates to pincodes offline, from a local dataset of pincode locations,
+and caches online lookups in the database.
+
+The dataset is a CSV file with a header row and at least a pincode, a latitude and a
+longitude column (for example the India Post "All India Pincode Directory"). Several rows
+may share a pincode, every row is indexed as its own point. Set PINCODE_DATASET to its path.
+"""
+
+import csv
+import datetime
+import math
+import threading
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import engine
+from app.models.geocode_cache import GeocodeCache
+from app.config.settings import (
+    PINCODE_DATASET,
+    PINCODE_MAX_DISTANCE_KM,
+    GEOCODE_CACHE_PRECISION,
+    GEOCODE_NEGATIVE_TTL,
+)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195
+
+PINCODE_COLUMNS = ("pincode", "postcode", "pin")
+LATITUDE_COLUMNS = ("latitude", "lat")
+LONGITUDE_COLUMNS = ("longitude", "long", "lon", "lng")
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Returns the great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class PincodeIndex:
+    """
+    A uniform latitude/longitude grid of pincode points.
+
+    A lookup only scans the cells in growing rings around the query point, so it
+    costs a few microseconds regardless of how many points are indexed.
+    """
+
+    def __init__(self, points, cell_size: float = 0.1):
+        """
+        Args:
+            points: Iterable of (pincode, latitude, longitude).
+            cell_size (float): Edge of a grid cell in degrees.
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+        self.size = 0
+        for pincode, lat, lon in points:
+            self.cells.setdefault(self._cell(lat, lon), []).append((lat, lon, pincode))
+            self.size += 1
+
+    def _cell(self, lat: float, lon: float):
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def nearest(self, lat: float, lon: float, max_distance_km: float = PINCODE_MAX_DISTANCE_KM):
+        """
+        Returns the (pincode, distance in km) of the closest point, or None if none is within max_distance_km.
+        """
+        row, col = self._cell(lat, lon)
+        # A ring of cells is at least this far from the query point along its shortest side
+        cell_km = self.cell_size * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+        max_ring = math.ceil(max_distance_km / cell_km) + 1
+        best = None
+        best_km = max_distance_km
+        for ring in range(max_ring + 1):
+            if best is not None and (ring - 1) * cell_km > best_km:
+                break
+            for cell in self._ring(row, col, ring):
+                for p_lat, p_lon, pincode in self.cells.get(cell, ()):
+                    distance = haversine_km(lat, lon, p_lat, p_lon)
+                    if distance <= best_km:
+                        best, best_km = pincode, distance
+        if best is None:
+            return None
+        return best, best_km
+
+    @staticmethod
+    def _ring(row: int, col: int, ring: int):
+        if ring == 0:
+            yield (row, col)
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield (row - ring, c)
+            yield (row + ring, c)
+        for r in range(row - ring + 1, row + ring):
+            yield (r, col - ring)
+            yield (r, col + ring)
+
+    def lookup(self, lat: float, lon: float):
+        """Returns the pincode closest to the given coordinates, or None"""
+        found = self.nearest(lat, lon)
+        return found[0] if found else None
+
+
+def _column(fieldnames, candidates):
+    lowered = {name.strip().lower(): name for name in fieldnames or ()}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    raise ValueError(f"Pincode dataset needs one of the columns {candidates}")
+
+
+def read_pincode_points(path: str):
+    """
+    Yields (pincode, latitude, longitude) from a pincode CSV file, skipping rows without valid coordinates.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        pin_col = _column(reader.fieldnames, PINCODE_COLUMNS)
+        lat_col = _column(reader.fieldnames, LATITUDE_COLUMNS)
+        lon_col = _column(reader.fieldnames, LONGITUDE_COLUMNS)
+        for row in reader:
+            try:
+                lat, lon = float(row[lat_col]), float(row[lon_col])
+            except (TypeError, ValueError):
+                continue
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                continue
+            pincode = (row[pin_col] or "").strip()
+            if pincode:
+                yield pincode, lat, lon
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_pincode_index():
+    """
+    Returns the index built from PINCODE_DATASET, loading it on first use.
+
+    Returns None if no dataset is configured or it cannot be read.
+    """
+    global _index, _index_loaded
+    if _index_loaded:
+        return _index
+    with _index_lock:
+        if not _index_loaded:
+            if PINCODE_DATASET:
+                try:
+                    _index = PincodeIndex(read_pincode_points(PINCODE_DATASET))
+                    print(f"Loaded {_index.size} pincode points from {PINCODE_DATASET}")
+                except (OSError, ValueError) as e:
+                    print(f"Error loading pincode dataset {PINCODE_DATASET}: {e}")
+            _index_loaded = True
+    return _index
+
+
+_cache_stats = {"hits": 0, "misses": 0, "errors": 0}
+_cache_stats_lock = threading.Lock()
+
+
+def _count(key: str):
+    with _cache_stats_lock:
+        _cache_stats[key] += 1
+
+
+def quantize(lat: float, lon: float, precision: int = GEOCODE_CACHE_PRECISION):
+    """
+    Returns the integer cache key of the given coordinates.
+
+    Coordinates that round to the same value at `precision` decimal places share a key,
+    4 places is about 11 m.
+    """
+    scale = 10**precision
+    return round(float(lat) * scale), round(float(lon) * scale)
+
+
+def get_cached_pincode(lat: float, lon: float):
+    """
+    Looks the coordinates up in the geocode cache shared by every worker.
+
+    An entry recording that no pincode was found is ignored once it is older than
+    GEOCODE_NEGATIVE_TTL seconds, as the lookup may have failed transiently.
+
+    Returns:
+        tuple: (True, pincode) on a hit, pincode may be None. (False, None) on a miss.
+    """
+    lat_key, long_key = quantize(lat, lon)
+    table = GeocodeCache.__table__
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(
+                table.select()
+                .with_only_columns(table.c.pincode, table.c.created_date)
+                .where(
+                    table.c.precision == GEOCODE_CACHE_PRECISION,
+                    table.c.lat_key == lat_key,
+                    table.c.long_key == long_key,
+                )
+            ).first()
+    except SQLAlchemyError as e:
+        print(f"Error reading geocode cache: {e}")
+        _count("errors")
+        return False, None
+    expired = row is not None and row.pincode is None and (
+        row.created_date is None
+        or row.created_date
+        < datetime.datetime.now() - datetime.timedelta(seconds=GEOCODE_NEGATIVE_TTL)
+    )
+    if row is None or expired:
+        _count("misses")
+        return False, None
+    _count("hits")
+    return True, row.pincode
+
+
+def cache_pincode(lat: float, lon: float, pincode):
+    """
+    Stores a resolved pincode in the geocode cache.
+
+    The first pincode stored for a key is kept, an entry without pincode is replaced by
+    the next lookup's answer.
+    """
+    lat_key, long_key = quantize(lat, lon)
+    table = GeocodeCache.__table__
+    statement = insert(table).values(
+        precision=GEOCODE_CACHE_PRECISION,
+        lat_key=lat_key,
+        long_key=long_key,
+        pincode=pincode,
+        created_date=datetime.datetime.now(),
+    )
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[table.c.precision, table.c.lat_key, table.c.long_key],
+                    set_={
+                        "pincode": statement.excluded.pincode,
+                        "created_date": statement.excluded.created_date,
+                    },
+                    where=table.c.pincode.is_(None),
+                )
+            )
+    except SQLAlchemyError as e:
+        print(f"Error writing geocode cache: {e}")
+        _count("errors")
+
+
+def get_geocode_cache_stats() -> dict:
+    """Returns the hit and miss counters of the geocode cache in this worker"""
+    with _cache_stats_lock:
+        stats = dict(_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else None
+    stats["precision"] = GEOCODE_CACHE_PRECISION
+    return stats
@@ -0,0 +1,456 @@
+"""
+This module runs bulk imports as background jobs.
+
+An import is stored as an import_jobs row and one import_job_items row per node, then
+processed by a pool of IMPORT_WORKERS threads, IMPORT_JOB_CHUNK nodes at a time through
+app.utils.bulk_import. Progress and per-node results are committed after every chunk,
+so a job interrupted by a restart resumes from its first pending node.
+
+Items are marked inserted in the transaction that inserts their nodes. A job resumed
+after the worker stopped between that insert and the end of the chunk only writes the
+missing descriptors of those items, instead of importing them again.
+
+The worker running a job refreshes its heartbeat while the job runs. A job whose
+heartbeat is older than IMPORT_JOB_STALE seconds may be claimed by another worker; every
+claim gets a new random token, and the previous worker stops before inserting nodes or
+recording results once its token no longer matches.
+"""
+
+import asyncio
+import datetime
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, bindparam, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, engine
+from app.models.import_job import ImportJob, ImportJobItem
+from app.utils.bulk_import import complete_nodes, import_nodes
+from app.utils.om2m_async import AsyncOm2m
+from app.utils.pagination import Page
+from app.config.settings import IMPORT_WORKERS, IMPORT_JOB_CHUNK, IMPORT_JOB_STALE
+
+FINISHED = ("done", "failed")
+"""Statuses of jobs that will not make progress anymore"""
+
+RESULT_FIELDS = {
+    "payload": ImportJobItem.payload,
+    "status": ImportJobItem.status,
+    "error": ImportJobItem.error,
+}
+"""Fields of the items returned by job_results"""
+
+HEARTBEAT_INTERVAL = max(IMPORT_JOB_STALE / 5, 1)
+"""Seconds between two heartbeats of a running job"""
+
+_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+_submitted = set()
+"""Ids of the jobs queued or running on this process"""
+
+
+class ClaimLost(Exception):
+    """Raised when another worker claimed the job this worker is running"""
+
+
+def add_items(job_id: int, nodes, start: int, session: Session) -> int:
+    """
+    Stores nodes as pending items of a job, numbered from start.
+
+    Raises:
+        KeyError: If a node has no sensor_type or name.
+
+    Returns:
+        int: The number of items added.
+    """
+    rows = [
+        {
+            "job_id": job_id,
+            "position": start + offset,
+            "sensor_type": node["sensor_type"],
+            "name": node["name"],
+            "payload": node,
+            "status": "pending",
+        }
+        for offset, node in enumerate(nodes)
+    ]
+    if rows:
+        session.execute(insert(ImportJobItem.__table__), rows)
+    return len(rows)
+
+
+def create_job(nodes, session: Session, source: str, user_id: int = None) -> tuple:
+    """
+    Creates a queued import job for the given nodes.
+
+    nodes may be any iterable, it is consumed IMPORT_JOB_CHUNK nodes at a time so a
+    streamed upload never has to fit in memory. The job and its items are committed
+    together, a failure while reading leaves nothing behind.
+
+    Returns:
+        tuple: The id of the job and its number of nodes.
+    """
+    job = ImportJob(source=source, status="queued", total=0, created_by=user_id)
+    session.add(job)
+    session.flush()
+    nodes = iter(nodes)
+    try:
+        while True:
+            chunk = list(islice(nodes, IMPORT_JOB_CHUNK))
+            if not chunk:
+                break
+            job.total += add_items(job.id, chunk, job.total, session)
+    except Exception:
+        session.rollback()
+        raise
+    job_id, total = job.id, job.total
+    session.commit()
+    return job_id, total
+
+
+def claim_job(job_id: int, session: Session):
+    """
+    Marks a job as running, unless it is finished or another worker is running it.
+
+    A running job whose heartbeat is older than IMPORT_JOB_STALE seconds is considered
+    abandoned and may be claimed again.
+
+    Returns:
+        str: The token of the claim, or None if the job was not claimed.
+    """
+    now = datetime.datetime.now()
+    stale = now - datetime.timedelta(seconds=IMPORT_JOB_STALE)
+    claim = str(uuid.uuid4())
+    claimed = session.execute(
+        update(ImportJob.__table__)
+        .where(ImportJob.id == job_id)
+        .where(
+            or_(
+                ImportJob.status == "queued",
+                and_(ImportJob.status == "running", ImportJob.heartbeat < stale),
+            )
+        )
+        .values(status="running", heartbeat=now, claim=claim)
+        .returning(ImportJob.id)
+    ).first()
+    session.commit()
+    return claim if claimed is not None else None
+
+
+def owned(job_id: int, claim: str):
+    """Returns the condition matching a job only while it is running under the given claim"""
+    return and_(
+        ImportJob.id == job_id, ImportJob.status == "running", ImportJob.claim == claim
+    )
+
+
+def heartbeat(job_id: int, claim: str) -> bool:
+    """
+    Refreshes the heartbeat of a job, on a connection of its own.
+
+    Returns:
+        bool: False if the job is no longer running under the given claim.
+    """
+    with engine.begin() as conn:
+        result = conn.execute(
+            update(ImportJob.__table__)
+            .where(owned(job_id, claim))
+            .values(heartbeat=datetime.datetime.now())
+        )
+    return result.rowcount == 1
+
+
+def check_claim(job_id: int, claim: str):
+    """
+    Raises:
+        ClaimLost: If the job is no longer running under the given claim.
+    """
+    if not heartbeat(job_id, claim):
+        raise ClaimLost(f"Import job {job_id} was claimed by another worker")
+
+
+def mark_inserted(item_ids: list, session: Session):
+    """Marks job items whose nodes are being inserted, in the transaction inserting them"""
+    session.execute(
+        update(ImportJobItem.__table__)
+        .where(ImportJobItem.id.in_(item_ids))
+        .values(status="inserted")
+    )
+
+
+def count_items(job_id: int, *statuses):
+    """Returns a subquery counting the items of a job with one of the given statuses"""
+    return (
+        select(func.count())
+        .select_from(ImportJobItem.__table__)
+        .where(ImportJobItem.job_id == job_id, ImportJobItem.status.in_(statuses))
+        .scalar_subquery()
+    )
+
+
+def record_results(job_id: int, claim: str, rows: list, items: list, session: Session):
+    """
+    Stores the outcome of a processed chunk and recounts the job counters from the items.
+
+    Raises:
+        ClaimLost: If the job is no longer running under the given claim, nothing is stored.
+    """
+    results = []
+    for row, item in zip(rows, items):
+        if item.pending:
+            outcome = "created"
+        elif item.invalid:
+            outcome = "invalid"
+        else:
+            outcome = "failed"
+        results.append(
+            {
+                "item_id": row.id,
+                "item_status": outcome,
+                "item_error": item.error and item.error[:500],
+                "item_payload": item.node,
+            }
+        )
+    # Job row first, so its lock keeps a new claim out until the items are stored
+    updated = session.execute(
+        update(ImportJob.__table__)
+        .where(owned(job_id, claim))
+        .values(heartbeat=datetime.datetime.now())
+    )
+    if updated.rowcount != 1:
+        session.rollback()
+        raise ClaimLost(f"Import job {job_id} was claimed by another worker")
+    table = ImportJobItem.__table__
+    session.execute(
+        update(table)
+        .where(table.c.id == bindparam("item_id"))
+        .values(
+            status=bindparam("item_status"),
+            error=bindparam("item_error"),
+            payload=bindparam("item_payload"),
+        ),
+        results,
+    )
+    session.execute(
+        update(ImportJob.__table__)
+        .where(ImportJob.id == job_id)
+        .values(
+            processed=count_items(job_id, "created", "failed", "invalid"),
+            created=count_items(job_id, "created"),
+            failed=count_items(job_id, "failed"),
+            invalid=count_items(job_id, "invalid"),
+        )
+    )
+    session.commit()
+
+
+def next_items(job_id: int, item_status: str, session: Session) -> list:
+    """Returns the next chunk of items of a job with the given status"""
+    return (
+        session.query(ImportJobItem.id, ImportJobItem.payload)
+        .filter(ImportJobItem.job_id == job_id, ImportJobItem.status == item_status)
+        .order_by(ImportJobItem.position)
+        .limit(IMPORT_JOB_CHUNK)
+        .all()
+    )
+
+
+def finish_job(job_id: int, claim: str, session: Session, error: str = None):
+    """Marks a job as done, or failed with the given error, if it is still under the given claim"""
+    session.execute(
+        update(ImportJob.__table__)
+        .where(owned(job_id, claim))
+        .values(
+            status="failed" if error else "done",
+            error=error and error[:500],
+            finished_date=datetime.datetime.now(),
+        )
+    )
+    session.commit()
+
+
+async def keep_alive(job_id: int, claim: str):
+    """Refreshes the heartbeat of a job every HEARTBEAT_INTERVAL seconds until cancelled"""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            if not await run_in_threadpool(heartbeat, job_id, claim):
+                return
+        except Exception as e:
+            print(f"Error refreshing the heartbeat of import job {job_id}: {e}")
+
+
+async def run_job(job_id: int, claim: str, session: Session):
+    """
+    Imports the pending items of a claimed job, chunk by chunk, after completing the
+    items an earlier run left inserted.
+
+    Raises:
+        ClaimLost: If another worker claimed the job meanwhile.
+    """
+    beating = asyncio.create_task(keep_alive(job_id, claim))
+    try:
+        # Nodes inserted by an interrupted run only miss their descriptor
+        while True:
+            rows = next_items(job_id, "inserted", session)
+            if not rows:
+                break
+            items = await complete_nodes([dict(row.payload) for row in rows], session)
+            record_results(job_id, claim, rows, items, session)
+
+        while True:
+            rows = next_items(job_id, "pending", session)
+            if not rows:
+                break
+
+            def on_insert(inserted, insert_session, rows=rows):
+                mark_inserted([rows[item.index].id for item in inserted], insert_session)
+
+            items = await import_nodes(
+                [dict(row.payload) for row in rows],
+                session,
+                before_insert=lambda: check_claim(job_id, claim),
+                on_insert=on_insert,
+            )
+            record_results(job_id, claim, rows, items, session)
+    finally:
+        beating.cancel()
+
+
+def process_job(job_id: int):
+    """
+    Claims and runs a job on the calling thread, with an event loop of its own.
+    """
+
+    async def main():
+        try:
+            await run_job(job_id, claim, session)
+        finally:
+            await AsyncOm2m.aclose()
+
+    session = SessionLocal()
+    try:
+        claim = claim_job(job_id, session)
+        if claim is None:
+            return
+        print(f"Import job {job_id} started")
+        try:
+            asyncio.run(main())
+        except ClaimLost as e:
+            session.rollback()
+            print(e)
+        except Exception as e:
+            session.rollback()
+            print(f"Import job {job_id} failed: {e}")
+            finish_job(job_id, claim, session, error=str(e))
+        else:
+            finish_job(job_id, claim, session)
+            print(f"Import job {job_id} done")
+    finally:
+        session.close()
+
+
+def submit(job_id: int):
+    """Queues a job on the import worker pool, unless this process already did"""
+    if job_id in _submitted:
+        return
+    _submitted.add(job_id)
+    future = _executor.submit(process_job, job_id)
+    future.add_done_callback(lambda _: _submitted.discard(job_id))
+
+
+def shutdown_workers():
+    """Drops the jobs still waiting for a worker, they are resumed on the next start"""
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+
+def resume_jobs() -> list:
+    """
+    Queues every job left queued or abandoned while running, e.g. by a restart.
+
+    Returns:
+        list: The ids of the queued jobs.
+    """
+    stale = datetime.datetime.now() - datetime.timedelta(seconds=IMPORT_JOB_STALE)
+    db = SessionLocal()
+    try:
+        job_ids = [
+            job_id
+            for (job_id,) in db.query(ImportJob.id)
+            .filter(
+                or_(
+                    ImportJob.status == "queued",
+                    and_(ImportJob.status == "running", ImportJob.heartbeat < stale),
+                )
+            )
+            .order_by(ImportJob.id)
+            .all()
+        ]
+    finally:
+        db.close()
+    for job_id in job_ids:
+        submit(job_id)
+    return job_ids
+
+
+async def resume_jobs_periodically():
+    """
+    Runs resume_jobs every IMPORT_JOB_STALE seconds until cancelled, so jobs abandoned
+    by a crashed worker are picked up once their heartbeat is stale.
+    """
+    while True:
+        try:
+            resumed = await run_in_threadpool(resume_jobs)
+            if resumed:
+                print(f"Resumed import jobs {resumed}")
+        except Exception as e:
+            print(f"Error resuming import jobs: {e}")
+        await asyncio.sleep(IMPORT_JOB_STALE)
+
+
+def job_status(job: ImportJob) -> dict:
+    """Returns the progress of a job"""
+    return {
+        "job_id": job.id,
+        "source": job.source,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "created": job.created,
+        "failed": job.failed,
+        "invalid": job.invalid,
+        "error": job.error,
+        "created_date": job.created_date,
+        "finished_date": job.finished_date,
+    }
+
+
+def job_results(job_id: int, session: Session, page: Page) -> dict:
+    """
+    Returns one page of the processed items of a job, see app.utils.pagination, grouped
+    like the synchronous import used to report them.
+    """
+    rows = page.fetch(
+        session.query(ImportJobItem).filter(
+            ImportJobItem.job_id == job_id,
+            ImportJobItem.status.in_(("created", "failed", "invalid")),
+        ),
+        ImportJobItem.id,
+        RESULT_FIELDS,
+        default=list(RESULT_FIELDS),
+    )
+    created_nodes, failed_nodes, invalid_sensor_nodes = [], [], []
+    for row in rows:
+        if row["status"] == "created":
+            created_nodes.append(row["payload"])
+        elif row["status"] == "invalid":
+            invalid_sensor_nodes.append({"node": row["payload"], "error": row["error"]})
+        else:
+            failed_nodes.append({"node": row["payload"], "error": row["error"]})
+    return {
+        "created_nodes": created_nodes,
+        "failed_nodes": failed_nodes,
+        "invalid_sensor_nodes": invalid_sensor_nodes,
+    }
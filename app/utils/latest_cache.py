@@ -0,0 +1,66 @@
+"""
+This module keeps the latest content instance of each node in memory, keyed by node name.
+
+The cache is filled by the ingest routes with the instance Mobius returns on creation,
+by Mobius notifications sent to /cin/notify, and by /latest reads that miss. Entries
+expire after LATEST_CACHE_TTL seconds, which bounds how stale a worker can be about
+readings ingested by another worker.
+"""
+
+import threading
+
+from app.utils.cache import TTLCache
+from app.config.settings import LATEST_CACHE_SIZE, LATEST_CACHE_TTL
+
+_latest = TTLCache(maxsize=LATEST_CACHE_SIZE, ttl=LATEST_CACHE_TTL)
+_latest_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def creation_time(body: dict) -> str:
+    """Returns the creation time of the instance in a Mobius response, "" if unknown"""
+    return (body.get("m2m:cin") or {}).get("ct") or ""
+
+
+def get_latest(node_name: str):
+    """
+    Returns the cached latest instance of a node, as Mobius returns it from /latest,
+    or None.
+    """
+    body = _latest.get(node_name)
+    with _latest_lock:
+        _stats["hits" if body is not None else "misses"] += 1
+    return body
+
+
+def remember_latest(node_name: str, body: dict):
+    """
+    Caches an instance of a node, unless an instance created later is already cached.
+
+    Args:
+        node_name (str): The node the instance belongs to.
+        body (dict): A Mobius response holding the instance under "m2m:cin".
+    """
+    if not isinstance(body, dict) or "m2m:cin" not in body:
+        return
+    with _latest_lock:
+        current = _latest.get(node_name)
+        if current is not None and creation_time(current) > creation_time(body):
+            return
+        _latest.set(node_name, body)
+
+
+def forget_latest(node_name: str):
+    """Drop the cached latest instance of a node"""
+    _latest.pop(node_name)
+
+
+def get_latest_cache_stats() -> dict:
+    """Returns the size and hit counters of the latest-value cache in this worker"""
+    with _latest_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else None
+    stats["size"] = len(_latest)
+    stats["ttl"] = LATEST_CACHE_TTL
+    return stats
@@ -0,0 +1,68 @@
+"""
+This module defines housekeeping jobs that run in the background of every worker.
+"""
+
+import asyncio
+import datetime
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, text
+
+from app.database import SessionLocal
+from app.models.token_table import TokenTable
+from app.config.settings import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_MINUTES,
+    TOKEN_PURGE_INTERVAL,
+)
+
+# Arbitrary key of the Postgres advisory lock held while purging tokens
+PURGE_LOCK_ID = 7_294_312
+
+
+def purge_tokens():
+    """
+    Deletes revoked token rows and rows whose tokens have all expired.
+
+    A row is kept until its refresh token has expired and an access token refreshed at
+    the last moment has expired too, since /user/refresh does not move created_date.
+    Every worker runs this job; an advisory lock makes the workers that find another
+    one purging skip their run instead of deleting the same rows.
+
+    Returns:
+        int: The number of rows deleted, or None if another worker is purging.
+    """
+    cutoff = datetime.datetime.now() - datetime.timedelta(
+        minutes=REFRESH_TOKEN_EXPIRE_MINUTES + ACCESS_TOKEN_EXPIRE_MINUTES
+    )
+    db = SessionLocal()
+    try:
+        locked = db.execute(
+            text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": PURGE_LOCK_ID}
+        ).scalar()
+        if not locked:
+            db.rollback()
+            return None
+        deleted = (
+            db.query(TokenTable)
+            .filter(or_(TokenTable.status == False, TokenTable.created_date < cutoff))
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+async def purge_tokens_periodically():
+    """
+    Runs purge_tokens every TOKEN_PURGE_INTERVAL seconds until cancelled.
+    """
+    while True:
+        try:
+            deleted = await run_in_threadpool(purge_tokens)
+            if deleted is not None:
+                print(f"Purged {deleted} expired or revoked tokens")
+        except Exception as e:
+            print(f"Error purging tokens: {e}")
+        await asyncio.sleep(TOKEN_PURGE_INTERVAL)
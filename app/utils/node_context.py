@@ -0,0 +1,123 @@
+"""
+This module caches what the content instance routes need to know about a node, keyed by its token.
+
+Invalidations only reach the cache of the worker that made the change. Other workers keep
+accepting the previous vendor API token until their entry expires, so NODE_CACHE_TTL is kept
+to a few seconds.
+"""
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.models.node import Node as DBNode
+from app.models.node_owners import NodeOwners as DBNodeOwners
+from app.models.user import User as DBUser
+from app.models.sensor_types import SensorTypes as DBSensorType
+from app.models.vertical import Vertical as DBVertical
+from app.utils.cache import TTLCache
+from app.utils.utils import create_hash
+from app.utils.validators import get_validator
+from app.config.settings import JWT_SECRET_KEY, NODE_CACHE_TTL, NODE_CACHE_SIZE
+
+_node_contexts = TTLCache(maxsize=NODE_CACHE_SIZE, ttl=NODE_CACHE_TTL)
+
+
+class NodeContext:
+    """
+    A snapshot of a node, its vendor, vertical and sensor type.
+    """
+
+    __slots__ = (
+        "token_id",
+        "node_id",
+        "node_name",
+        "orid",
+        "node_data_orid",
+        "sensor_type_id",
+        "vertical_name",
+        "vendor_email",
+        "parameters",
+        "data_types",
+        "validator",
+        "api_token",
+    )
+
+    def __init__(self, token_id, row):
+        self.token_id = token_id
+        self.node_id = row.id
+        self.node_name = row.node_name
+        self.orid = row.orid
+        self.node_data_orid = row.node_data_orid
+        self.sensor_type_id = row.sensor_type_id
+        self.vertical_name = row.res_short_name
+        self.vendor_email = row.email
+        self.parameters = tuple(row.parameters or ())
+        self.data_types = tuple(row.data_types or ())
+        self.validator = get_validator(
+            row.sensor_type_id, self.parameters, self.data_types
+        )
+        # API token the vendor has to send, see nodes.get_vendor
+        self.api_token = create_hash([row.email, row.node_data_orid], JWT_SECRET_KEY)
+
+    def __repr__(self):
+        return f"<NodeContext token={self.token_id} node={self.node_name}>"
+
+
+def get_node_context(token_id, db: Session) -> NodeContext:
+    """
+    Returns the context of the node mapped to the given token.
+
+    Served from the cache when possible, otherwise resolved with a single query.
+
+    Raises:
+        HTTPException: If the node token is not found or no vendor is assigned to the node.
+    """
+    token_id = str(token_id)
+    ctx = _node_contexts.get(token_id)
+    if ctx is not None:
+        return ctx
+
+    row = (
+        db.query(
+            DBNode.id,
+            DBNode.node_name,
+            DBNode.orid,
+            DBNode.node_data_orid,
+            DBNode.sensor_type_id,
+            DBVertical.res_short_name,
+            DBSensorType.parameters,
+            DBSensorType.data_types,
+            DBUser.email,
+        )
+        .outerjoin(DBSensorType, DBSensorType.id == DBNode.sensor_type_id)
+        .outerjoin(DBVertical, DBVertical.id == DBSensorType.vertical_id)
+        .outerjoin(DBNodeOwners, DBNodeOwners.node_id == DBNode.id)
+        .outerjoin(DBUser, DBUser.id == DBNodeOwners.vendor_id)
+        .filter(DBNode.token_num == token_id)
+        .first()
+    )
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Node token not found"
+        )
+    # Do not cache this, assign_vendor would have nothing to invalidate
+    if row.email is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vendor not assigned to the node",
+        )
+
+    ctx = NodeContext(token_id, row)
+    _node_contexts.set(token_id, ctx)
+    return ctx
+
+
+def invalidate_node_context(token_id):
+    """Drop the cached context of the node mapped to the given token"""
+    if token_id is not None:
+        _node_contexts.pop(str(token_id))
+
+
+def invalidate_sensor_type_contexts(sensor_type_id: int):
+    """Drop the cached context of every node of the given sensor type"""
+    _node_contexts.pop_where(lambda ctx: ctx.sensor_type_id == sensor_type_id)
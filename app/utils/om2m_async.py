@@ -0,0 +1,254 @@
+"""
+This module provides an asyncio variant of the Om2m client on a pooled keep-alive HTTP connection.
+"""
+
+import asyncio
+import weakref
+from urllib.parse import urlencode
+
+import httpx
+
+from app.config.settings import (
+    OM2M_POOL_SIZE,
+    OM2M_KEEPALIVE,
+    OM2M_TIMEOUT,
+    OM2M_RETRIES,
+    OM2M_RETRY_BACKOFF,
+)
+
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+class AsyncOm2m:
+    """
+    Awaitable counterpart of app.utils.om2m_lib.Om2m.
+
+    Every instance shares one httpx.AsyncClient per event loop, so all routes reuse the
+    same keep-alive connections to Mobius. Failed requests are retried with exponential
+    backoff: GET and DELETE on any transport error or 502/503/504, POST only when the
+    connection could not be opened, as the request then never reached Mobius.
+    """
+
+    _clients = weakref.WeakKeyDictionary()
+
+    def __init__(self, XM2MRI, url):
+        self.XM2MORIGIN = "SOrigin"
+        self.XM2MRI = XM2MRI
+        self.url = url
+
+    @classmethod
+    def client(cls) -> httpx.AsyncClient:
+        """Returns the pooled client of the running event loop"""
+        loop = asyncio.get_running_loop()
+        client = cls._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=OM2M_POOL_SIZE,
+                    max_keepalive_connections=OM2M_KEEPALIVE,
+                ),
+                timeout=OM2M_TIMEOUT,
+            )
+            cls._clients[loop] = client
+        return client
+
+    @classmethod
+    async def aclose(cls):
+        """Closes the pooled client of the running event loop"""
+        client = cls._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def request(self, method, url, timeout=None, **kwargs) -> httpx.Response:
+        """Sends a request to Mobius, retrying transient failures"""
+        idempotent = method in ("GET", "DELETE")
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        for attempt in range(OM2M_RETRIES + 1):
+            last_attempt = attempt == OM2M_RETRIES
+            try:
+                response = await self.client().request(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                if last_attempt:
+                    raise
+            except httpx.TransportError:
+                if last_attempt or not idempotent:
+                    raise
+            else:
+                if last_attempt or not idempotent:
+                    return response
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+            await asyncio.sleep(OM2M_RETRY_BACKOFF * 2**attempt)
+
+    async def create_ae(self, name, labels=[], rr=False):
+        data = {
+            "m2m:ae": {
+                "rn": name,
+                "api": "0.2.481.2.0001.001.000111",
+                "lbl": labels,
+                "rr": rr,
+            }
+        }
+        headers = {
+            "X-M2M-RI": self.XM2MRI,
+            "X-M2M-Origin": self.XM2MORIGIN + name,
+            "Content-Type": "application/json;ty=2",
+        }
+
+        r = await self.request("POST", self.url, headers=headers, json=data)
+        return r.status_code, r.text
+
+    async def create_container(self, name, parent, labels=[], mni=120):
+        # Create Node
+        data = {"m2m:cnt": {"rn": name, "lbl": labels, "mni": mni}}
+        headers = {
+            "X-M2M-RI": self.XM2MRI,
+            "X-M2M-Origin": self.XM2MORIGIN + parent,
+            "Content-Type": "application/json;ty=3",
+        }
+
+        r = await self.request(
+            "POST", self.url + "/" + parent, headers=headers, json=data
+        )
+
+        # Create Data Container inside Node
+        data = {"m2m:cnt": {"rn": "Data", "lbl": labels, "mni": mni}}
+
+        r = await self.request(
+            "POST", self.url + "/" + parent + "/" + name, headers=headers, json=data
+        )
+
+        return r
+
+    async def create_cin(self, parent, node, con, lbl=None, timeout=None):
+        data = {"m2m:cin": {"con": con, "lbl": lbl}}
+
+        headers = {
+            "X-M2M-RI": self.XM2MRI,
+            "X-M2M-Origin": self.XM2MORIGIN + parent,
+            "Content-Type": "application/json;ty=4",
+        }
+
+        r = await self.request(
+            "POST",
+            self.url + "/" + parent + "/" + node + "/Data?rcn=1",
+            headers=headers,
+            json=data,
+            timeout=timeout,
+        )
+        return r
+
+    async def create_subscription(self, resource_path, rn, nu, exc=10, timeout=None):
+        headers = {
+            "X-M2M-RI": self.XM2MRI,
+            "X-M2M-Origin": self.XM2MORIGIN,
+            "Content-Type": "application/json;ty=23",
+        }
+        payload = {
+            "m2m:sub": {
+                "rn": rn,
+                "enc": {"net": ["3"]},
+                "nu": [nu],
+                "exc": exc,
+            }
+        }
+
+        r = await self.request(
+            "POST",
+            f"{self.url}/{resource_path}",
+            headers=headers,
+            json=payload,
+            timeout=timeout,
+        )
+        return r
+
+    async def get_subscription(self, resource_path, timeout=None):
+        headers = {
+            "X-M2M-RI": self.XM2MRI,
+            "X-M2M-Origin": self.XM2MORIGIN,
+        }
+        r = await self.request(
+            "GET",
+            f"{self.url}/{resource_path}?rcn=1",
+            headers=headers,
+            timeout=timeout,
+        )
+        return r
+
+    async def delete_subscription(self, resource_path, timeout=None):
+        headers = {
+            "X-M2M-RI": self.XM2MRI,
+            "X-M2M-Origin": self.XM2MORIGIN,
+        }
+        r = await self.request(
+            "DELETE",
+            f"{self.url}/{resource_path}",
+            headers=headers,
+            timeout=timeout,
+        )
+        return r
+
+    async def delete_resource(self, resource_path, timeout=None):
+        headers = {
+            "Accept": "application/json",
+            "X-M2M-RI": self.XM2MRI,
+            "X-M2M-Origin": self.XM2MORIGIN + resource_path.split("/")[0],
+        }
+        response = await self.request(
+            "DELETE",
+            f"{self.url}/{resource_path}?rcn=0",
+            headers=headers,
+            timeout=timeout,
+        )
+
+        return response
+
+    async def get_containers(
+        self, resource_path="", ri=None, all=False, filters=None, timeout=None
+    ):
+        """
+        Gets a resource, with all its child resources when all is True.
+
+        filters are oneM2M filter criteria added to the query, e.g. cra, crb and lim.
+        """
+        headers = {
+            "Accept": "application/json",
+            "X-M2M-RI": self.XM2MRI,
+            "X-M2M-Origin": self.XM2MORIGIN,
+        }
+        url = f"{self.url}/{resource_path}"
+        query = {"rcn": 4} if all else {}
+        query.update(filters or {})
+        if query:
+            url = f"{url}?{urlencode(query)}"
+        response = await self.request("GET", url, headers=headers, timeout=timeout)
+        return response
+
+    async def get_all_resource(self, resource_path: str, timeout=None):
+        headers = {
+            "Accept": "application/json",
+            "X-M2M-RI": self.XM2MRI,
+            "X-M2M-Origin": self.XM2MORIGIN,
+        }
+        response = await self.request(
+            "GET", f"{self.url}/{resource_path}?rcn=4", headers=headers, timeout=timeout
+        )
+        return response
+
+    async def get_la_cin(self, resource_path, timeout=None):
+        """
+        Gets latest content instance in OM2M.
+        """
+        headers = {
+            "Accept": "application/json",
+            "X-M2M-RI": self.XM2MRI,
+            "X-M2M-Origin": self.XM2MORIGIN,
+        }
+        r = await self.request(
+            "GET",
+            f"{self.url}/{resource_path}/latest",
+            headers=headers,
+            timeout=timeout,
+        )
+        return r
@@ -1,4 +1,14 @@
+from urllib.parse import urlencode
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from app.config.settings import OM2M_POOL_SIZE, OM2M_TIMEOUT
+
+# One keep-alive connection pool shared by every Om2m instance in the process
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_maxsize=OM2M_POOL_SIZE))
+session.mount("https://", HTTPAdapter(pool_maxsize=OM2M_POOL_SIZE))
 
 
 class Om2m:
@@ -22,7 +32,7 @@ class Om2m:
             "Content-Type": "application/json;ty=2",
         }
 
-        r = requests.post(self.url, headers=headers, json=data)
+        r = session.post(self.url, headers=headers, json=data, timeout=OM2M_TIMEOUT)
         return r.status_code, r.text
 
     def create_container(self, name, parent, labels=[], mni=120):
@@ -34,18 +44,23 @@ class Om2m:
             "Content-Type": "application/json;ty=3",
         }
 
-        r = requests.post(self.url + "/" + parent, headers=headers, json=data)
+        r = session.post(
+            self.url + "/" + parent, headers=headers, json=data, timeout=OM2M_TIMEOUT
+        )
 
         # Create Data Container inside Node
         data = {"m2m:cnt": {"rn": "Data", "lbl": labels, "mni": mni}}
 
-        r = requests.post(
-            self.url + "/" + parent + "/" + name, headers=headers, json=data
+        r = session.post(
+            self.url + "/" + parent + "/" + name,
+            headers=headers,
+            json=data,
+            timeout=OM2M_TIMEOUT,
         )
 
         return r
 
-    def create_cin(self, parent, node, con, lbl=None, timeout=None):
+    def create_cin(self, parent, node, con, lbl=None, timeout=OM2M_TIMEOUT):
         data = {"m2m:cin": {"con": con, "lbl": lbl}}
 
         headers = {
@@ -54,7 +69,7 @@ class Om2m:
             "Content-Type": "application/json;ty=4",
         }
 
-        r = requests.post(
+        r = session.post(
             self.url + "/" + parent + "/" + node + "/Data?rcn=1",
             headers=headers,
             json=data,
@@ -62,7 +77,7 @@ class Om2m:
         )
         return r
 
-    def create_subscription(self, resource_path, rn, nu, exc=10, timeout=None):
+    def create_subscription(self, resource_path, rn, nu, exc=10, timeout=OM2M_TIMEOUT):
         headers = {
             "X-M2M-RI": self.XM2MRI,
             "X-M2M-Origin": self.XM2MORIGIN,
@@ -77,7 +92,7 @@ class Om2m:
             }
         }
 
-        r = requests.post(
+        r = session.post(
             f"{self.url}/{resource_path}",
             headers=headers,
             json=payload,
@@ -85,38 +100,38 @@ class Om2m:
         )
         return r
 
-    def get_subscription(self, resource_path, timeout=None):
+    def get_subscription(self, resource_path, timeout=OM2M_TIMEOUT):
         headers = {
             "X-M2M-RI": self.XM2MRI,
             "X-M2M-Origin": self.XM2MORIGIN,
         }
-        r = requests.get(
+        r = session.get(
             f"{self.url}/{resource_path}?rcn=1",
             headers=headers,
             timeout=timeout,
         )
         return r
 
-    def delete_subscription(self, resource_path, timeout=None):
+    def delete_subscription(self, resource_path, timeout=OM2M_TIMEOUT):
         headers = {
             "X-M2M-RI": self.XM2MRI,
             "X-M2M-Origin": self.XM2MORIGIN,
         }
-        r = requests.delete(
+        r = session.delete(
             f"{self.url}/{resource_path}",
             headers=headers,
             timeout=timeout,
         )
         return r
 
-    def delete_resource(self, resource_path, timeout=None):
+    def delete_resource(self, resource_path, timeout=OM2M_TIMEOUT):
         print(f"Deleting {resource_path}", "XM2MORIGIN", self.XM2MORIGIN)
         headers = {
             "Accept": "application/json",
             "X-M2M-RI": self.XM2MRI,
             "X-M2M-Origin": self.XM2MORIGIN + resource_path.split("/")[0],
         }
-        response = requests.delete(
+        response = session.delete(
             url=f"{self.url}/{resource_path}?rcn=0",
             headers=headers,
             timeout=timeout,
@@ -124,30 +139,39 @@ class Om2m:
 
         return response
 
-    def get_containers(self, resource_path="", ri=None, all=False, timeout=None):
+    def get_containers(
+        self, resource_path="", ri=None, all=False, filters=None, timeout=OM2M_TIMEOUT
+    ):
+        """
+        Gets a resource, with all its child resources when all is True.
+
+        filters are oneM2M filter criteria added to the query, e.g. cra, crb and lim.
+        """
         headers = {
             "Accept": "application/json",
             "X-M2M-RI": self.XM2MRI,
             "X-M2M-Origin": self.XM2MORIGIN,
         }
         url = f"{self.url}/{resource_path}"
-        if all:
-            url = f"{url}?rcn=4"
-        response = requests.get(url=url, headers=headers, timeout=timeout)
+        query = {"rcn": 4} if all else {}
+        query.update(filters or {})
+        if query:
+            url = f"{url}?{urlencode(query)}"
+        response = session.get(url=url, headers=headers, timeout=timeout)
         return response
 
-    def get_all_resource(self, resource_path: str, timeout=None):
+    def get_all_resource(self, resource_path: str, timeout=OM2M_TIMEOUT):
         headers = {
             "Accept": "application/json",
             "X-M2M-RI": self.XM2MRI,
             "X-M2M-Origin": self.XM2MORIGIN,
         }
-        response = requests.get(
+        response = session.get(
             f"{self.url}/{resource_path}?rcn=4", headers=headers, timeout=timeout
         )
         return response
 
-    def get_la_cin(self, resource_path, timeout=None):
+    def get_la_cin(self, resource_path, timeout=OM2M_TIMEOUT):
         """
         Gets latest content instance in OM2M.
         """
@@ -157,7 +181,7 @@ class Om2m:
             "X-M2M-Origin": self.XM2MORIGIN,
         }
         print(f"{self.url}/{resource_path}/latest")
-        r = requests.get(
+        r = session.get(
             f"{self.url}/{resource_path}/latest",
             headers=headers,
             timeout=timeout,
@@ -0,0 +1,102 @@
+"""
+This module provides keyset pagination and field projection for the listing routes.
+
+Listing routes accept these query parameters:
+- after: the cursor returned by the previous page, rows with a greater key are returned
+- limit: the page size, PAGE_SIZE_DEFAULT by default and at most PAGE_SIZE_MAX
+- fields: comma separated names of the fields to return
+- count: when true, the number of matching rows is returned in the X-Total-Count header
+
+The body stays a list; the cursor of the next page, if any, is returned in the
+X-Next-Cursor header.
+"""
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy.orm import Query
+
+from app.config.settings import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+KEY_LABEL = "page_key"
+"""Label of the key column added to projected queries"""
+
+
+def model_fields(model, exclude=()) -> dict:
+    """Returns the columns of a model that may be requested, by name"""
+    return {
+        column.key: getattr(model, column.key)
+        for column in model.__table__.columns
+        if column.key not in exclude
+    }
+
+
+def bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+class Page:
+    """
+    The pagination parameters of a request, and the headers of its response.
+    """
+
+    __slots__ = ("response", "after", "limit", "fields", "count")
+
+    def __init__(self, request: Request, response: Response):
+        params = request.query_params
+        self.response = response
+        try:
+            self.after = int(params["after"]) if params.get("after") else None
+            self.limit = int(params.get("limit") or PAGE_SIZE_DEFAULT)
+        except ValueError:
+            raise bad_request("after and limit must be integers") from None
+        if not 1 <= self.limit <= PAGE_SIZE_MAX:
+            raise bad_request(f"limit must be between 1 and {PAGE_SIZE_MAX}")
+        fields = params.get("fields")
+        self.fields = (
+            [field.strip() for field in fields.split(",") if field.strip()]
+            if fields
+            else None
+        )
+        self.count = (params.get("count") or "").lower() in ("1", "true", "yes")
+
+    def fetch(self, query: Query, key, fields: dict = None, default: list = None) -> list:
+        """
+        Returns one page of the query, ordered by key.
+
+        Args:
+            query (Query): The filtered query.
+            key: The unique integer column the pages are keyed on.
+            fields (dict): The fields that may be requested, by name.
+            default (list): The fields returned when none are requested. When None,
+                the rows of the query are returned as they are.
+
+        Raises:
+            HTTPException: If an unknown field is requested.
+        """
+        selected = self.fields or default
+        if selected is not None:
+            unknown = [name for name in selected if name not in (fields or {})]
+            if unknown:
+                raise bad_request(
+                    f"Unknown fields {', '.join(unknown)}, expected some of {', '.join(fields or {})}"
+                )
+
+        if self.count:
+            self.response.headers["X-Total-Count"] = str(query.order_by(None).count())
+
+        if self.after is not None:
+            query = query.filter(key > self.after)
+        if selected is not None:
+            query = query.with_entities(
+                key.label(KEY_LABEL), *(fields[name].label(name) for name in selected)
+            )
+        rows = query.order_by(key).limit(self.limit + 1).all()
+
+        if len(rows) > self.limit:
+            rows = rows[: self.limit]
+            last = rows[-1]
+            cursor = getattr(last, KEY_LABEL if selected is not None else key.key)
+            self.response.headers["X-Next-Cursor"] = str(cursor)
+
+        if selected is None:
+            return rows
+        return [{name: row._mapping[name] for name in selected} for row in rows]
@@ -0,0 +1,67 @@
+"""
+This module allocates numbers from named counters stored in the sequence_counters table.
+"""
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import engine
+from app.models.sequence_counter import SequenceCounter
+
+
+def reserve_statement(name: str, count: int, seed=None):
+    """
+    Returns the statement reserving count numbers of a sequence, RETURNING the last one.
+
+    The counter row is created on first use, starting after seed, a scalar SQL expression
+    such as the highest number already in use. Concurrent callers get disjoint blocks.
+    The statement can be used as a CTE to consume the numbers in the same round trip.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    table = SequenceCounter.__table__
+    start = func.coalesce(seed, 0) if seed is not None else 0
+    return (
+        insert(table)
+        .values(name=name, value=start + count)
+        .on_conflict_do_update(
+            index_elements=[table.c.name], set_={"value": table.c.value + count}
+        )
+        .returning(table.c.value)
+    )
+
+
+def reserve(name: str, count: int = 1, seed=None) -> int:
+    """
+    Reserves count consecutive numbers of a sequence in one statement.
+
+    The reservation commits on its own connection, so the row lock is not held while the
+    caller does slow work. The numbers are unique and increasing but not gap-free: a
+    failed create skips its numbers unless it hands them back with release.
+
+    Returns:
+        int: The first reserved number.
+    """
+    with engine.begin() as conn:
+        last = conn.execute(reserve_statement(name, count, seed)).scalar_one()
+    return last - count + 1
+
+
+def release(name: str, first: int, count: int = 1) -> bool:
+    """
+    Hands back a block reserved by reserve, for a caller that failed before using it.
+
+    Only the tail of a sequence can be handed back: if numbers were reserved after the
+    block, the counter is left alone and the block stays a gap in the numbering.
+
+    Returns:
+        bool: Whether the block was handed back.
+    """
+    table = SequenceCounter.__table__
+    with engine.begin() as conn:
+        result = conn.execute(
+            table.update()
+            .where(table.c.name == name, table.c.value == first + count - 1)
+            .values(value=table.c.value - count)
+        )
+    return result.rowcount == 1
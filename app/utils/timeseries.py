@@ -0,0 +1,147 @@
+"""
+This module stores a copy of every ingested reading in the readings table, so history and
+aggregation queries are answered by Postgres instead of Mobius, whose containers only
+keep their latest readings.
+
+readings is range partitioned by month on ts. Partitions are created ahead of time by
+ensure_partitions, readings outside of them land in the readings_default partition.
+When a month's partition is created, its readings already in readings_default are
+moved into it, which Postgres requires before the partition can be attached.
+"""
+
+import asyncio
+import datetime
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import engine
+from app.models.reading import Reading
+from app.utils.utils import parse_time
+from app.config.settings import TIMESERIES_PARTITIONS_AHEAD
+
+PARTITION_CHECK_INTERVAL = 24 * 3600
+"""Seconds between two runs of ensure_partitions in the background"""
+
+# Arbitrary key of the Postgres advisory lock held while creating a partition
+PARTITION_LOCK_ID = 7_294_313
+
+
+def month_start(moment: datetime.date, offset: int = 0) -> datetime.date:
+    """Returns the first day of the month of moment, offset by a number of months"""
+    month = moment.year * 12 + moment.month - 1 + offset
+    return datetime.date(month // 12, month % 12 + 1, 1)
+
+
+def create_partition(connection, start: datetime.date) -> bool:
+    """
+    Creates the partition of the month starting on start, unless it exists.
+
+    The partition is built as a plain table, filled with the readings of its month found
+    in readings_default, then attached. Run it in a transaction of its own so a failure
+    does not affect other months.
+
+    Returns:
+        bool: True if the partition was created.
+    """
+    connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": PARTITION_LOCK_ID})
+    name = f"readings_y{start.year}m{start.month:02d}"
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return False
+    end = month_start(start, 1)
+    connection.execute(text(f"CREATE TABLE {name} (LIKE readings INCLUDING DEFAULTS)"))
+    moved = connection.execute(
+        text(
+            "WITH moved AS (DELETE FROM readings_default "
+            "WHERE ts >= :start AND ts < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {"start": start, "end": end},
+    ).rowcount
+    connection.execute(
+        text(
+            f"ALTER TABLE readings ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    )
+    if moved:
+        print(f"Moved {moved} readings from readings_default to {name}")
+    return True
+
+
+def upcoming_months(ahead: int = TIMESERIES_PARTITIONS_AHEAD) -> list:
+    """Returns the first days of the current month and of the next ahead months"""
+    now = datetime.datetime.utcnow()
+    return [month_start(now, offset) for offset in range(ahead + 1)]
+
+
+def ensure_partitions() -> list:
+    """
+    Creates the upcoming monthly partitions that do not exist yet, each in its own transaction.
+
+    Returns:
+        list: The first days of the months whose partition was created.
+    """
+    created = []
+    for start in upcoming_months():
+        try:
+            with engine.begin() as conn:
+                if create_partition(conn, start):
+                    created.append(start)
+        except SQLAlchemyError as e:
+            print(f"Error creating the reading partition of {start:%Y-%m}: {e}")
+    return created
+
+
+async def ensure_partitions_periodically():
+    """
+    Runs ensure_partitions every day until cancelled, so the next month always has a
+    partition before its first reading arrives.
+    """
+    while True:
+        try:
+            await run_in_threadpool(ensure_partitions)
+        except Exception as e:
+            print(f"Error creating reading partitions: {e}")
+        await asyncio.sleep(PARTITION_CHECK_INTERVAL)
+
+
+def reading_row(node_id: int, sensor_type_id: int, values: list, body: dict) -> dict:
+    """
+    Returns the readings row of an instance created in Mobius.
+
+    Args:
+        node_id (int): The node the reading belongs to.
+        sensor_type_id (int): The sensor type of the node.
+        values (list): The validated values, ordered as the sensor type parameters.
+        body (dict): The Mobius response, its creation time is used when present.
+    """
+    try:
+        ts = parse_time((body.get("m2m:cin") or {}).get("ct") or "")
+    except (AttributeError, ValueError):
+        ts = datetime.datetime.utcnow()
+    return {
+        "ts": ts,
+        "node_id": node_id,
+        "sensor_type_id": sensor_type_id,
+        "values": values,
+    }
+
+
+def record_readings(rows: list) -> bool:
+    """
+    Appends readings to the readings table in one statement.
+
+    Mobius stays the source of truth, a failure is logged and the readings are only
+    missing from the local history.
+    """
+    if not rows:
+        return True
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(Reading.__table__), rows)
+    except SQLAlchemyError as e:
+        print(f"Error recording readings: {e}")
+        return False
+    return True
@@ -2,14 +2,19 @@
 This module defines various utility functions used elsewhere.
 """
 
+import datetime
 import hashlib
 
 from geopy.geocoders import Nominatim
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from app.models.vertical import Vertical as DBVertical
 from app.models.sensor_types import SensorTypes as DBSensorTypes
 from app.models.node import Node as DBNode
+from app.utils.sequences import release, reserve
+from app.utils.geocode import get_pincode_index, get_cached_pincode, cache_pincode
+from app.config.settings import GEOCODER, GEOCODE_CACHE
 
 
 def create_hash(arr_str_to_hash: list, secret_key: str) -> str:
@@ -68,38 +73,73 @@ def get_sensor_type_name(sensor_type_id: int, db: Session):
     return res.res_name
 
 
-def get_next_sensor_node_number(sensor_type: int, db: Session) -> int:
-    """Get the number of the next sensor of the given sensor type"""
+def reserve_sensor_node_numbers(sensor_type: int, count: int = 1) -> int:
+    """
+    Reserves the numbers of the next count sensors of the given sensor type.
 
-    res = (
-        db.query(DBNode)
-        .filter(DBNode.sensor_type_id == sensor_type)
-        .order_by(DBNode.sensor_node_number.desc())
-        .first()
+    Returns:
+        int: The first reserved number.
+    """
+
+    # Seeds the counter from the nodes created before it existed
+    seed = (
+        select(func.max(DBNode.sensor_node_number))
+        .where(DBNode.sensor_type_id == sensor_type)
+        .scalar_subquery()
     )
-    if res is None:
-        return 1
-    return res.sensor_node_number + 1
+    return reserve(f"sensor_node_number:{sensor_type}", count, seed=seed)
+
+
+def release_sensor_node_numbers(sensor_type: int, first: int, count: int = 1) -> bool:
+    """
+    Hands back sensor numbers reserved by a create that failed before using them.
+
+    Returns:
+        bool: Whether the numbers were handed back, see sequences.release.
+    """
+    return release(f"sensor_node_number:{sensor_type}", first, count)
 
 
 def get_pincode(latitude, longitude):
-    """Get the pincode from latitude and longitude"""
+    """
+    Get the pincode from latitude and longitude.
+
+    Uses the offline pincode index when a dataset is configured (GEOCODER=auto or offline),
+    and falls back to Nominatim otherwise (GEOCODER=auto or nominatim). Nominatim answers
+    are kept in the geocode cache, keyed by coordinates rounded to GEOCODE_CACHE_PRECISION.
+    """
+
+    if GEOCODER != "nominatim":
+        index = get_pincode_index()
+        if index is not None:
+            return index.lookup(latitude, longitude)
+        if GEOCODER == "offline":
+            return None
+
+    if GEOCODE_CACHE:
+        found, pincode = get_cached_pincode(latitude, longitude)
+        if found:
+            return pincode
 
     geolocator = Nominatim(user_agent="pincode_finder")
     location = geolocator.reverse((latitude, longitude), language="en")
 
     if location is None:
         print("No location found for these coordinates.")
-        return None
-
-    address = location.raw.get("address", {})
-    pincode = address.get("postcode")
+        pincode = None
+    else:
+        address = location.raw.get("address", {})
+        pincode = address.get("postcode")
 
+    if GEOCODE_CACHE:
+        cache_pincode(latitude, longitude, pincode)
     return pincode
 
 
-def get_node_code(vert: str, sensor_type: int, lat: int, long: int, db: Session):
-    """Returns the node code from node ID"""
+def get_node_code(
+    vert: str, sensor_type: int, lat: int, long: int, db: Session, sensor_node_number: int = None
+):
+    """Returns the node code from node ID, reserving a sensor node number if none is given"""
 
     vert = (
         db.query(DBVertical)
@@ -111,20 +151,58 @@ def get_node_code(vert: str, sensor_type: int, lat: int, long: int, db: Session)
     if not vert:
         raise Exception("Vertical not found")
 
-    vert_code = vert.res_short_name.split("AE-")[1]
-
-    print("I am here, before pincode. I have the vert_code: ", vert_code)
-    # NOTE: Takes a lot of time to complete
+    # NOTE: Takes a lot of time to complete without an offline pincode dataset
     pin_code = get_pincode(lat, long)
-    pin_code = str(pin_code)[-4:] if pin_code else "0000"
 
-    sensor_node_number = (get_next_sensor_node_number(sensor_type, db),)
+    if sensor_node_number is None:
+        sensor_node_number = reserve_sensor_node_numbers(sensor_type)
 
-    code = f"{vert_code}{sensor_type:02d}-{pin_code:04}-{sensor_node_number[0]:04d}"
+    code = format_node_code(vert.res_short_name, sensor_type, pin_code, sensor_node_number)
     print(code)
     return code
 
 
+def format_node_code(vert_short_name: str, sensor_type: int, pin_code, sensor_node_number: int):
+    """Returns the node code built from its vertical, sensor type, pincode and number"""
+
+    vert_code = vert_short_name.split("AE-")[1]
+    pin_code = str(pin_code)[-4:] if pin_code else "0000"
+    return f"{vert_code}{sensor_type:02d}-{pin_code:04}-{sensor_node_number:04d}"
+
+
+MOBIUS_TIME_FORMAT = "%Y%m%dT%H%M%S"
+"""Format of the oneM2M creation and modification times, e.g. 20240131T235959"""
+
+
+def parse_time(value: str) -> datetime.datetime:
+    """
+    Parses a time given as ISO 8601 or in the Mobius format.
+
+    Times with a timezone are converted to UTC, the timezone Mobius stamps resources in,
+    and returned without timezone like the times without one.
+
+    Raises:
+        ValueError: If the time is in neither format.
+    """
+    try:
+        moment = datetime.datetime.strptime(value, MOBIUS_TIME_FORMAT)
+    except ValueError:
+        moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def to_mobius_time(value: str) -> str:
+    """
+    Converts a time given as ISO 8601 or in the Mobius format to the Mobius format.
+
+    Raises:
+        ValueError: If the time is in neither format.
+    """
+    return parse_time(value).strftime(MOBIUS_TIME_FORMAT)
+
+
 def get_node_coordinates_by_name(node_id: str, db: Session):
     "Returns the coordinates (latitude and longitude) from node table"
     cur_node = db.query(DBNode).filter(DBNode.node_name == node_id).first()
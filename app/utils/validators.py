@@ -0,0 +1,152 @@
+"""
+This module compiles the parameters of a sensor type into a reusable reading validator.
+"""
+
+import math
+import threading
+
+from fastapi import HTTPException, status
+
+
+def _check_str(value):
+    if isinstance(value, str):
+        return value
+    raise TypeError
+
+
+def _check_int(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    raise TypeError
+
+
+def _check_float(value):
+    if isinstance(value, float):
+        # The request body parser accepts NaN and Infinity, JSON (and JSONB) does not
+        if not math.isfinite(value):
+            raise ValueError
+        return value
+    # JSON has no separate integer and float types, 5 is a valid float reading
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    raise TypeError
+
+
+def _check_num(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError
+        return value
+    raise TypeError
+
+
+def _check_bool(value):
+    if isinstance(value, bool):
+        return value
+    raise TypeError
+
+
+def _check_any(value):
+    return value
+
+
+COERCERS = {
+    "str": _check_str,
+    "string": _check_str,
+    "int": _check_int,
+    "integer": _check_int,
+    "float": _check_float,
+    "double": _check_float,
+    "num": _check_num,
+    "number": _check_num,
+    "numeric": _check_num,
+    "bool": _check_bool,
+    "boolean": _check_bool,
+}
+"""Data type names used in sensor types, mapped to their checks"""
+
+
+class SensorTypeValidator:
+    """
+    Validates readings against the parameters of one sensor type.
+
+    The parameters and data types are resolved into (param, data type, coercer)
+    triples once, so checking a reading is a single pass over them.
+    """
+
+    __slots__ = ("signature", "fields")
+
+    def __init__(self, parameters, data_types):
+        parameters = tuple(parameters or ())
+        data_types = tuple(data_types or ())
+        self.signature = (parameters, data_types)
+        self.fields = tuple(
+            (
+                param,
+                data_type,
+                COERCERS.get(str(data_type).lower(), _check_any),
+            )
+            for param, data_type in zip(parameters, data_types)
+        )
+
+    def __call__(self, reading: dict) -> list:
+        """
+        Returns the values of the reading, ordered as the sensor type parameters.
+
+        Raises:
+            HTTPException: If a parameter is missing or has the wrong data type.
+        """
+        values = []
+        for param, data_type, coerce in self.fields:
+            try:
+                value = reading[param]
+            except KeyError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Missing parameter " + param,
+                ) from None
+            try:
+                values.append(coerce(value))
+            except TypeError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Wrong data type for "
+                    + param
+                    + ". Expected "
+                    + str(data_type)
+                    + " but got "
+                    + str(type(value)),
+                ) from None
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Value of " + param + " must be a finite number",
+                ) from None
+        return values
+
+
+_validators = {}
+_validators_lock = threading.Lock()
+
+
+def get_validator(sensor_type_id: int, parameters, data_types) -> SensorTypeValidator:
+    """
+    Returns the compiled validator of a sensor type.
+
+    The validator is rebuilt when the parameters or data types differ from the ones it was compiled from.
+    """
+    signature = (tuple(parameters or ()), tuple(data_types or ()))
+    validator = _validators.get(sensor_type_id)
+    if validator is None or validator.signature != signature:
+        validator = SensorTypeValidator(*signature)
+        with _validators_lock:
+            _validators[sensor_type_id] = validator
+    return validator
+
+
+def invalidate_validator(sensor_type_id: int):
+    """Drop the compiled validator of a sensor type"""
+    with _validators_lock:
+        _validators.pop(sensor_type_id, None)
@@ -1,10 +1,11 @@
 """
 This module contains the main FastAPI application.
+
+Importing it does no I/O, so workers bind their port right away. Prepare the
+database and Mobius beforehand with `python -m app.bootstrap`.
 """
 
-import sys
-import time
-import requests
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.user import router as user_router
@@ -12,75 +13,18 @@ from app.routes.verticals import router as verticals_router
 from app.routes.subscribe import router as subscribe_router
 from app.routes.import_conf import router as import_conf_router
 from app.routes.token import router as token_router
-from app.database import engine as database, Base, get_session, reset_database
-from app.utils.initial_setup import initial_setup
+from app.database import engine as database, get_session
 from app.routes.nodes import router as nodes_router
 from app.routes.cin import router as cin_router
 from app.routes.sensor_types import router as sensor_types_router
 from app.routes.stats import router as stats_router
-from app.config.settings import OM2M_URL, ROOT_PATH
-
-def initialize():
-    """
-    This function initializes the application by creating the database tables and creating an admin user if it does not exist.
-    """
-    # Wait for database to be ready
-    for i in range(5):
-        try:
-            database.connect()
-            break
-        except Exception as e:
-            print(f"Error connecting to database: {e}")
-            print(f"Attempt {i+1} failed. Retrying in 10 seconds...")
-            time.sleep(10)
-    else:
-        print("All attempts to connect to database failed. Exiting program.")
-        sys.exit(1)
-
-    Base.metadata.create_all(bind=database)
-
-    # connect to the database
-    try:
-        database.connect()
-        db = next(get_session())
-
-        # ########################################################
-        # ## WARNING: DO NOT UNCOMMENT THE FOLLOWING LINE      ##
-        # ## UNLESS YOU KNOW EXACTLY WHAT YOU ARE DOING!       ##
-        # ## THIS COULD POTENTIALLY CAUSE SERIOUS ISSUES.      ##
-        # ## ENSURE YOU MANUALLY CLEAR ONEM2M DB AFTER THIS.   ##
-        # ########################################################
-        # reset_database()
-
-    except Exception as e:
-        print(f"Error connecting to database: {e}")
-        raise e
-
-    try:
-        for i in range(5):
-            try:
-                res = requests.get(OM2M_URL, timeout=5)
-                # if 404
-                if res.status_code == 404:
-                    raise requests.exceptions.RequestException("Mobius not found")
-                elif res.status_code == 503:
-                    raise requests.exceptions.RequestException("Mobius not ready")
-                print("Connection to Mobius successful.")
-                break
-            except requests.exceptions.RequestException:
-                print(f"Attempt {i+1} failed. Retrying in 10 seconds...")
-                time.sleep(10)
-        else:
-            print("All attempts to connect to Mobius failed. Exiting program.")
-            sys.exit(1)
-        initial_setup(db)
-
-    except requests.RequestException as e:
-        print(f"Unable to connect to {OM2M_URL}. Error: {e}")
-        raise e
-
-
-initialize()
+from app.routes.health import router as health_router
+from app.routes.readings import router as readings_router
+from app.utils.om2m_async import AsyncOm2m
+from app.utils.maintenance import purge_tokens_periodically
+from app.utils.import_jobs import resume_jobs_periodically, shutdown_workers
+from app.utils.timeseries import ensure_partitions_periodically
+from app.config.settings import ROOT_PATH, TIMESERIES_ENABLED
 
 app = FastAPI(root_path=ROOT_PATH)
 
@@ -91,15 +35,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],  # Pagination headers
 )
 
 
+background_tasks = []
+
+
+@app.on_event("startup")
+async def startup():
+    """
+    This function is called when the application starts. It starts the background housekeeping jobs
+    and resumes the import jobs interrupted by the last shutdown.
+    """
+    background_tasks.append(asyncio.create_task(purge_tokens_periodically()))
+    background_tasks.append(asyncio.create_task(resume_jobs_periodically()))
+    if TIMESERIES_ENABLED:
+        background_tasks.append(asyncio.create_task(ensure_partitions_periodically()))
+
+
 @app.on_event("shutdown")
 async def shutdown():
     """
     This function is called when the application shuts down. It disconnects from the database.
     """
-    get_session().close()
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    shutdown_workers()
+    database.dispose()
+    await AsyncOm2m.aclose()
 
 
 # create a / endpoint
@@ -118,6 +83,8 @@ app.include_router(sensor_types_router, prefix="/sensor-types", tags=["Sensor Ty
 app.include_router(token_router, prefix="/token")
 app.include_router(stats_router, prefix="/stats")
 app.include_router(subscribe_router, prefix="/subscription")
+app.include_router(health_router, prefix="/health", tags=["Health"])
+app.include_router(readings_router, prefix="/readings", tags=["Readings"])
 
 # Include get_session as a dependency globally
 app.dependency_overrides[get_session] = get_session
@@ -2,6 +2,7 @@
 
 
 if [[ $1 == "--dev" ]]; then
+    python -m app.bootstrap || exit 1
     uvicorn main:app --host 0.0.0.0 --port 8000 --log-level debug --reload
 elif [[ $1 == "--test" ]]; then
     # If .env file exists make a backup
@@ -42,6 +43,8 @@ elif [[ $1 == "--test" ]]; then
         exit 1
     fi
 else
+    # wait for Postgres and Mobius, apply migrations and run the initial setup once, before any worker starts
+    python -m app.bootstrap || exit 1
     # print the value of the WORKERS environment variable
     echo "WORKERS: ${WORKERS:-1}"
     gunicorn main:app --workers=${WORKERS:-1} -k uvicorn.workers.UvicornWorker -b 0.0.0.0:8000 --preload
@@ -1,9 +1,10 @@
 from fastapi.testclient import TestClient
 from app.utils.delete_with_payload import CustomTestClient
-from main import app, initialize
+from main import app
+from app.bootstrap import bootstrap
 
-# Initialize the app
-initialize()
+# Prepare the database and Mobius
+bootstrap()
 
 print("Testing main.py")
 
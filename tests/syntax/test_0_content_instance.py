@@ -93,6 +93,34 @@ def test_create_cin():
     assert response.status_code == 200
 
 
+def test_create_cin_batch():
+    time.sleep(1)
+    response = client.post(
+        "/user/login", json={"email": "admin@localhost", "password": "admin"}
+    )
+    access_token = response.json()["access_token"]
+    create_sensor_type(access_token)
+    node = create_node(access_token, "test_create_cin_batch")
+    create_vendor(access_token)
+    assign_vendor_to_node(node["node_name"], access_token)
+    vendor = get_vendor(node["node_name"], access_token)
+    response = client.post(
+        "/cin/create-batch/" + str(node["token_num"]),
+        json=[
+            {"test_parameter": "test_value_1"},
+            {"wrong_parameter": "test_value_2"},
+            {"test_parameter": "test_value_3"},
+        ],
+        headers={"Authorization": f"Bearer {vendor['api_token']}"},
+    )
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["status_code"] == 201
+    assert results[1]["status_code"] == 400
+    assert results[2]["status_code"] == 201
+
+
 def test_create_cin_invalid_node_id():
     time.sleep(1)
     response = client.post(
@@ -144,3 +172,152 @@ def test_invalid_type_of_req_create_cin():
         "/cin/create/1", headers={"Authorization": f"Bearer {access_token}"}
     )
     assert response.status_code == 405
+
+
+def test_notify_disabled_without_secret():
+    # LATEST_NOTIFY_SECRET is not set for the tests, so notifications are refused
+    response = client.post(
+        "/cin/notify?secret=anything",
+        json={"m2m:sgn": {"vrq": True}},
+    )
+    assert response.status_code == 404
+
+
+def test_readings_of_unknown_node():
+    response = client.post(
+        "/user/login", json={"email": "admin@localhost", "password": "admin"}
+    )
+    access_token = response.json()["access_token"]
+    response = client.get(
+        "/readings/not-a-node", headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == 404
+
+    response = client.get(
+        "/readings/not-a-node/aggregate?param=temperature&bucket=fortnight",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 400
+
+
+def test_get_node_order_with_limit():
+    response = client.post(
+        "/user/login", json={"email": "admin@localhost", "password": "admin"}
+    )
+    access_token = response.json()["access_token"]
+    response = client.get(
+        "/nodes/get-node/not-a-node?limit=5&order=desc",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 400
+
+
+def test_latest_of_many_nodes():
+    time.sleep(1)
+    response = client.post(
+        "/user/login", json={"email": "admin@localhost", "password": "admin"}
+    )
+    access_token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+    create_sensor_type(access_token)
+    node = create_node(access_token, "test_latest_of_many_nodes")
+    create_vendor(access_token)
+    assign_vendor_to_node(node["node_name"], access_token)
+    vendor = get_vendor(node["node_name"], access_token)
+    response = client.post(
+        "/cin/create/" + str(node["token_num"]),
+        json={"test_parameter": "latest_value"},
+        headers={"Authorization": f"Bearer {vendor['api_token']}"},
+    )
+    assert response.status_code == 200
+
+    # by name, unknown names are reported as missing
+    response = client.post(
+        "/nodes/latest",
+        json={"node_names": [node["node_name"], "not-a-node"]},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["nodes"][node["node_name"]]["values"] == ["latest_value"]
+    assert body["nodes"][node["node_name"]]["ct"]
+    assert body["missing"] == ["not-a-node"]
+
+    # by area
+    response = client.post("/nodes/latest", json={"area": "Kakinada"}, headers=headers)
+    assert response.status_code == 200
+    assert node["node_name"] in response.json()["nodes"]
+    assert response.json()["missing"] == []
+
+    # by vertical
+    response = client.get("/verticals/all?fields=id,res_name", headers=headers)
+    vertical = next(v["res_name"] for v in response.json() if v["id"] == 1)
+    response = client.post("/nodes/latest", json={"vertical": vertical}, headers=headers)
+    assert response.status_code == 200
+    assert node["node_name"] in response.json()["nodes"]
+
+    # a selection is required
+    response = client.post("/nodes/latest", json={}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_readings_history_and_aggregate():
+    time.sleep(1)
+    response = client.post(
+        "/user/login", json={"email": "admin@localhost", "password": "admin"}
+    )
+    access_token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = client.post(
+        "/sensor-types/create",
+        json={
+            "res_name": "test_reading_sensor_type",
+            "parameters": ["temperature"],
+            "data_types": ["float"],
+            "labels": ["test_label"],
+            "vertical_id": 1,
+        },
+        headers=headers,
+    )
+    sensor_type_id = response.json()["id"]
+    response = client.post(
+        "/nodes/create-node",
+        json={
+            "lbls": [],
+            "sensor_type_id": sensor_type_id,
+            "latitude": 10,
+            "longitude": 90,
+            "area": "Kakinada",
+            "name": "test_readings_history_and_aggregate",
+        },
+        headers=headers,
+    )
+    node = response.json()
+    create_vendor(access_token)
+    assign_vendor_to_node(node["node_name"], access_token)
+    vendor = get_vendor(node["node_name"], access_token)
+    response = client.post(
+        "/cin/create-batch/" + str(node["token_num"]),
+        json=[{"temperature": 10}, {"temperature": 20}, {"temperature": 30}],
+        headers={"Authorization": f"Bearer {vendor['api_token']}"},
+    )
+    assert [r["status_code"] for r in response.json()] == [201, 201, 201]
+
+    response = client.get("/readings/" + node["node_name"], headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["parameters"] == ["temperature"]
+    assert sorted(r["values"][0] for r in body["readings"]) == [10, 20, 30]
+
+    response = client.get(
+        "/readings/" + node["node_name"] + "/aggregate?param=temperature&bucket=month",
+        headers=headers,
+    )
+    assert response.status_code == 200
+    buckets = response.json()["buckets"]
+    # the readings may straddle a month boundary
+    count = sum(b["count"] for b in buckets)
+    assert count == 3
+    assert sum(b["avg"] * b["count"] for b in buckets) / count == 20
+    assert min(b["min"] for b in buckets) == 10
+    assert max(b["max"] for b in buckets) == 30
@@ -8,6 +8,21 @@ with open('../import-template.json', 'r') as f:
     template_body = json.load(f)
 
 
+def wait_for_job(job_id, access_token, timeout=300):
+    # imports run in the background, poll until the job is finished
+    deadline = time.time() + timeout
+    while True:
+        response = client.get(
+            f"/import/jobs/{job_id}?results=true",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        assert response.status_code == 200
+        job = response.json()
+        if job["status"] in ("done", "failed") or time.time() > deadline:
+            return job
+        time.sleep(1)
+
+
 def test_valid_bulk_import():
     # login as admin and get access token
     time.sleep(1)
@@ -19,6 +34,9 @@ def test_valid_bulk_import():
     print(response)
     # assert 1 == 2 # for confirmation
     assert response.status_code == 200
+    job = wait_for_job(response.json()["job_id"], access_token)
+    assert job["status"] == "done"
+    assert job["processed"] == job["total"] == len(template_body["nodes"])
 
 def test_invalid_keys():
     # login as admin and get access token
@@ -104,14 +122,15 @@ def test_repeated_name():
     response = client.post("/import/import", json=nodes,
         headers={"Authorization": f"Bearer {access_token}"}
     )
-    print(response.json())
-    recvd_error = response.json()['failed_nodes'][0]['error']
+    job = wait_for_job(response.json()["job_id"], access_token)
+    print(job)
+    recvd_error = job['failed_nodes'][0]['error']
     expected_error = 'Node: Name 2 already exists'
     assert recvd_error == expected_error
     
     # no other behaviour
-    assert len(response.json()['invalid_sensor_nodes']) == 0
-    assert len(response.json()['created_nodes']) == 0
+    assert len(job['invalid_sensor_nodes']) == 0
+    assert len(job['created_nodes']) == 0
     
 def test_invalid_sensor_type():
     # login as admin and get access token
@@ -135,11 +154,54 @@ def test_invalid_sensor_type():
     response = client.post("/import/import", json=nodes,
         headers={"Authorization": f"Bearer {access_token}"}
     )
-    print(response.json())
-    recvd_error = response.json()['invalid_sensor_nodes'][0]['error']
+    job = wait_for_job(response.json()["job_id"], access_token)
+    print(job)
+    recvd_error = job['invalid_sensor_nodes'][0]['error']
     expected_error = "Sensor type 'test_sensor_type_xyz' not found"
     assert recvd_error == expected_error
     
     # no other behaviour
-    assert len(response.json()['failed_nodes']) == 0
-    assert len(response.json()['created_nodes']) == 0
\ No newline at end of file
+    assert len(job['failed_nodes']) == 0
+    assert len(job['created_nodes']) == 0
+
+def test_import_job_not_found():
+    # login as admin and get access token
+    time.sleep(1)
+    response = client.post(
+        "/user/login", json={"email": "admin@localhost", "password": "admin"}
+    )
+    access_token = response.json()["access_token"]
+    response = client.get("/import/jobs/999999",
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Import job not found"
+
+
+def test_name_too_long():
+    # login as admin and get access token
+    time.sleep(1)
+    response = client.post(
+        "/user/login", json={"email": "admin@localhost", "password": "admin"}
+    )
+    access_token = response.json()["access_token"]
+    nodes = {
+    "nodes": [
+        {
+            "latitude": 12.3,
+            "longitude": 12.3,
+            "area": "Mehdipatnam2",
+            "sensor_type":"test_sensor_type",
+            "domain": "Water Quality",
+            "name": "N" * 60                         # nodes.name holds 50 characters
+        }
+    ]
+    }
+    response = client.post("/import/import", json=nodes,
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    assert response.status_code == 200
+    job = wait_for_job(response.json()["job_id"], access_token)
+    assert job["status"] == "done"
+    assert job["failed_nodes"][0]["error"] == "name must be at most 50 characters"
+    assert len(job["created_nodes"]) == 0
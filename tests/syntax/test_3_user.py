@@ -325,6 +325,8 @@ def test_get_users():
         "/user/getusers", headers={"Authorization": f"Bearer {access_token}"}
     )
     assert response.status_code == 200
+    # password hashes are never listed
+    assert all("password" not in user for user in response.json())
 
 def test_invalid_type_of_request_get_users():
     time.sleep(1)
@@ -595,4 +597,31 @@ def test_invalid_type_of_request_change_password():
     )
     assert response.status_code == 405
     assert response.json() == {"detail": "Method Not Allowed"}
-    
\ No newline at end of file
+    
+
+def test_logout():
+    time.sleep(1)
+    response = client.post(
+        "/user/login", json={"email": "admin@localhost", "password": "admin"}
+    )
+    access_token = response.json()["access_token"]
+
+    # warm up the authentication cache
+    response = client.get(
+        "/user/profile",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 200
+
+    response = client.post(
+        "/user/logout",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 200
+
+    response = client.get(
+        "/user/profile",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Token blocked"}
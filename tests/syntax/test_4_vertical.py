@@ -130,6 +130,44 @@ def test_get_all_ae():
     assert found == True
 
 
+def test_get_all_verticals_paginated():
+    time.sleep(1)
+    response = client.post(
+        "/user/login", json={"email": "admin@localhost", "password": "admin"}
+    )
+    access_token = response.json()["access_token"]
+
+    response = client.get(
+        "/verticals/all?count=true",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 200
+    total = int(response.headers["X-Total-Count"])
+    assert total == len(response.json())
+
+    # walk the pages one vertical at a time, projecting two fields
+    seen, cursor = [], None
+    while True:
+        url = "/verticals/all?limit=1&fields=id,res_name"
+        if cursor:
+            url += f"&after={cursor}"
+        response = client.get(url, headers={"Authorization": f"Bearer {access_token}"})
+        assert response.status_code == 200
+        assert all(set(obj) == {"id", "res_name"} for obj in response.json())
+        seen += [obj["id"] for obj in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == sorted(seen)
+    assert len(seen) == total
+
+    response = client.get(
+        "/verticals/all?fields=nope",
+        headers={"Authorization": f"Bearer {access_token}"},
+    )
+    assert response.status_code == 400
+
+
 def test_delete_ae():
     time.sleep(1)
     response = client.post(
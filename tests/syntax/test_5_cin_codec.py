@@ -0,0 +1,60 @@
+import pytest
+
+from app.utils import cin_codec
+
+
+def test_json_round_trip():
+    values = [21.5, True, "ok", 3, None]
+    con = cin_codec.encode(values)
+    assert con == '[21.5,true,"ok",3,null]'
+    assert cin_codec.decode(con) == values
+
+
+def test_legacy_repr():
+    # content instances written before readings were stored as JSON
+    assert cin_codec.decode("['1', 'True']") == ["1", "True"]
+    assert cin_codec.decode("['21.5', 'ok']") == ["21.5", "ok"]
+
+
+def test_mixed_batch():
+    cons = ['[1,2.5,"a"]', "['1', 'True']", "[3,4]"]
+    assert cin_codec.decode_many(cons) == [[1, 2.5, "a"], ["1", "True"], [3, 4]]
+    assert cin_codec.decode_many([]) == []
+
+
+def test_json_batch():
+    cons = [cin_codec.encode([i, i * 0.5]) for i in range(100)]
+    assert cin_codec.decode_many(cons) == [[i, i * 0.5] for i in range(100)]
+
+
+def test_not_an_array():
+    # "1,2" is neither JSON nor a list repr, it must not decode to a tuple
+    with pytest.raises(ValueError):
+        cin_codec.decode("1,2")
+    with pytest.raises(ValueError):
+        cin_codec.decode_many(["[1]", "1,2"])
+    with pytest.raises(ValueError):
+        cin_codec.decode("not a reading")
+    # JSON that is not an array is not a reading either
+    with pytest.raises(ValueError):
+        cin_codec.decode("5")
+    with pytest.raises(ValueError):
+        cin_codec.decode('{"a": 1}')
+
+
+def test_lenient_batch():
+    cons = ["[1]", "1,2", "['1']", "not a reading"]
+    assert cin_codec.decode_many(cons, lenient=True) == [[1], None, ["1"], None]
+
+
+def test_split_batch():
+    # "[1" and "2]" join into one array of the right length, they must not decode as [1, 2]
+    cons = ["[1", "2]", "3,4"]
+    with pytest.raises(ValueError):
+        cin_codec.decode_many(cons)
+    assert cin_codec.decode_many(cons, lenient=True) == [None, None, None]
+
+
+def test_lenient_batch_of_non_arrays():
+    assert cin_codec.decode_many(["5", "[1]"], lenient=True) == [None, [1]]
+    assert cin_codec.decode_many(['{"a": 1}', "[2]"], lenient=True) == [None, [2]]